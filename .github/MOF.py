@@ -167,13 +167,29 @@ SPLIT_ON_COMMA_TYPES = {
     "equity release workshops",
 }
 
-def transform_wishlist(form_df: pd.DataFrame, costs_df: pd.DataFrame) -> pd.DataFrame:
+def _added_time_col(form_df: pd.DataFrame):
+    """Return the Zoho "Added Time" column (or its Created Time alias), if any."""
+    col_lc_map = {str(c).strip().lower(): c for c in form_df.columns}
+    for cand in ["Added Time", "added time", "AddedTime", "Created Time", "Created time"]:
+        if cand.lower() in col_lc_map:
+            return col_lc_map[cand.lower()]
+    return None
+
+def _added_time_text(data_rows: pd.DataFrame, added_time_col) -> pd.Series:
+    """Added Time per data row as dd/mm/yyyy text ("" when the column is missing)."""
+    if added_time_col and added_time_col in data_rows.columns:
+        return pd.to_datetime(data_rows[added_time_col], errors='coerce').dt.strftime('%d/%m/%Y')
+    return pd.Series([""] * len(data_rows))
+
+def transform_wishlist(form_df: pd.DataFrame, costs_df: pd.DataFrame, added_series: pd.Series = None) -> pd.DataFrame:
     """
     Parse Zoho wide export (row 0 = subheaders) → long rows, then join Cost by (Type, Product).
     Includes:
       - Events or Marketing (from cost sheet) in clean output
       - Added Time from Zoho (dd/mm/yyyy) in clean output
       - Regional Roadshow Products split on commas into separate rows
+    added_series, if given, is the Added Time text for each data row (0-based),
+    used instead of parsing the column here.
     """
     if form_df.shape[0] < 2:
         return pd.DataFrame(columns=['_ridx'] + REPEATED_FIRST + ['Type','Event Date (if applicable)','Product','Cost','F2F or Online?','Events or Marketing','Added Time'])
@@ -194,17 +210,10 @@ def transform_wishlist(form_df: pd.DataFrame, costs_df: pd.DataFrame) -> pd.Data
     q1_col = col_lc_map.get(MAIN_NOTES_QUESTIONS[0].lower())
     q2_col = col_lc_map.get(MAIN_NOTES_QUESTIONS[1].lower())
 
-    # "Added Time" column from Zoho (optional)
-    added_time_col = None
-    for cand in ["Added Time", "added time", "AddedTime", "Created Time", "Created time"]:
-        if cand.lower() in col_lc_map:
-            added_time_col = col_lc_map[cand.lower()]
-            break
-    if added_time_col and added_time_col in data_rows.columns:
-        # Convert to dd/mm/yyyy string per row
-        added_series = pd.to_datetime(data_rows[added_time_col], errors='coerce').dt.strftime('%d/%m/%Y')
-    else:
-        added_series = pd.Series([""] * len(data_rows))
+    # "Added Time" column from Zoho (optional), as dd/mm/yyyy text per row
+    added_time_col = _added_time_col(form_df)
+    if added_series is None:
+        added_series = _added_time_text(data_rows, added_time_col)
 
     # ---- Parse into line items (excluding notes columns) ----
     records = []
@@ -384,6 +393,41 @@ def transform_wishlist(form_df: pd.DataFrame, costs_df: pd.DataFrame) -> pd.Data
     out = out[final_cols_internal].sort_values(['_ridx','Type','Event Date (if applicable)','Product']).reset_index(drop=True)
     return out
 
+# ===========================
+# Chunked transformation (large Zoho exports)
+# ===========================
+CHUNK_THRESHOLD_ROWS = 100_000
+CHUNK_ROWS = 50_000
+
+def transform_wishlist_chunked(form_df: pd.DataFrame, costs_df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS, progress_callback=None) -> pd.DataFrame:
+    """
+    Run transform_wishlist over slices of the Zoho export so progress can be
+    reported as it goes. Row 0 (subheaders) is re-attached to every slice and
+    _ridx is offset so it stays unique across chunks. Added Time is parsed once
+    over the whole export, so every chunk shares the same date format.
+    """
+    n_data = max(form_df.shape[0] - 1, 0)
+    if n_data <= chunk_rows:
+        out = transform_wishlist(form_df, costs_df)
+        if progress_callback: progress_callback(1.0)
+        return out
+
+    subheader_row = form_df.iloc[[0]]
+    added_all = _added_time_text(form_df.iloc[1:].reset_index(drop=True), _added_time_col(form_df))
+    parts = []
+    for start in range(0, n_data, chunk_rows):
+        stop = min(start + chunk_rows, n_data)
+        chunk = pd.concat([subheader_row, form_df.iloc[1 + start:1 + stop]])
+        part = transform_wishlist(chunk, costs_df, added_all.iloc[start:stop].reset_index(drop=True))
+        if not part.empty:
+            part['_ridx'] = part['_ridx'] + start
+            parts.append(part)
+        if progress_callback: progress_callback(stop / n_data)
+
+    if not parts:
+        return transform_wishlist(form_df.iloc[:0], costs_df)
+    return pd.concat(parts, ignore_index=True)
+
 # ===========================
 # Template helpers (shared)
 # ===========================
@@ -450,7 +494,8 @@ def _get_notes_ws(wb):
 # ===========================
 # Template population
 # ===========================
-def _populate_template_bytes(template_bytes: bytes, cleaned: pd.DataFrame, costs_df: pd.DataFrame | None) -> BytesIO:
+def _write_templates(zf: zipfile.ZipFile, template_bytes: bytes, cleaned: pd.DataFrame, costs_df: pd.DataFrame | None, progress_callback=None) -> None:
+    """Populate one workbook per submission and write each straight into `zf` as it completes."""
     # Build a (Type, Product)->F2F map if we have a cost sheet
     f2f_map = {}
     if costs_df is not None and 'F2F or Online?' in costs_df.columns:
@@ -460,184 +505,185 @@ def _populate_template_bytes(template_bytes: bytes, cleaned: pd.DataFrame, costs
         tmp['Product_norm'] = tmp['Product'].apply(_n).apply(_apply_product_aliases)
         f2f_map = dict(zip(zip(tmp['Type_norm'], tmp['Product_norm']), tmp['F2F or Online?']))
 
-    zip_buf = BytesIO()
     dotted = Side(style='dotted')
     header_font = Font(name="Segoe UI", size=12, bold=True, color="FFFFFF")  # white header text
     ACC_FMT = '_-£* #,##0.00_-;_-£* -#,##0.00_-;_-£* "-"??_-;_-@_-'
 
-    with zipfile.ZipFile(zip_buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        # one workbook per ORIGINAL Zoho row (_ridx)
-        for ridx, dfp in cleaned.groupby('_ridx', dropna=False):
-            wb = load_workbook(BytesIO(template_bytes))
-            ws = wb.active
-
-            # Pull repeated fields from the first row of this submission
-            prov = "" if 'Provider Name' not in dfp.columns else ("" if pd.isna(dfp['Provider Name'].iloc[0]) else str(dfp['Provider Name'].iloc[0]))
-            nm   = _sanitize_name(dfp['Name'].iloc[0] if 'Name' in dfp.columns and len(dfp) else "")
-            ph   = "" if 'Phone' not in dfp.columns else ("" if pd.isna(dfp['Phone'].iloc[0]) else str(dfp['Phone'].iloc[0]))
-            em   = "" if 'Email' not in dfp.columns else ("" if pd.isna(dfp['Email'].iloc[0]) else str(dfp['Email'].iloc[0]))
-            wti  = dfp['When To Invoice'].iloc[0] if 'When To Invoice' in dfp.columns else ""
-
-            ws['B4'] = prov
-            ws['B6'] = nm
-            ws['D4'] = wti
-            ws['D6'] = ph
-            ws['F6'] = em
-
-            # Secondary contacts
-            def _first(dfcol):
-                return (dfcol.iloc[0] if dfcol is not None and len(dfp) else "")
-            if 'Events Name' in dfp.columns: ws['B10'] = _first(dfp['Events Name'])
-            if 'Events Email' in dfp.columns: ws['B12'] = _first(dfp['Events Email'])
-            if 'Marketing Publications Name' in dfp.columns: ws['D10'] = _first(dfp['Marketing Publications Name'])
-            if 'Marketing Publications Email' in dfp.columns: ws['D12'] = _first(dfp['Marketing Publications Email'])
-            if 'Invoice Name' in dfp.columns: ws['F10'] = _first(dfp['Invoice Name'])
-            if 'Invoice Email' in dfp.columns: ws['F12'] = _first(dfp['Invoice Email'])
-            if 'Copy Name' in dfp.columns: ws['H10'] = _first(dfp['Copy Name'])
-            if 'Copy Email' in dfp.columns: ws['H12'] = _first(dfp['Copy Email'])
-
-            # Find table header
-            hdr_row, hdr_col, hmap = _find_table_header_row(ws)
-            c_Type   = _get_col(hmap, "Type")
-            c_Prod   = _get_col(hmap, "Product")
-            c_Det    = _get_col(hmap, "Details")
-            c_Date   = _get_col(hmap, "Date")
-            c_Charge = _get_col(hmap, "Charge", aliases=("Cost","Price"))
-            c_Qty    = _get_col(hmap, "Qty", aliases=("Quantity",))
-            c_Total  = _get_col(hmap, "Total")
-            c_Notes  = _get_col(hmap, "Notes")
-
-            # White header font
-            for c in [c_Type,c_Prod,c_Det,c_Date,c_Charge,c_Qty,c_Total,c_Notes]:
-                if c: ws.cell(hdr_row, c).font = header_font
-
-            # Insert enough rows
-            start_row = hdr_row + 1
-            n = len(dfp)
-            if n > 1:
-                ws.insert_rows(start_row + 1, amount=n - 1)
-
-            # Fill rows
-            for i, (_, r) in enumerate(dfp.iterrows()):
-                rr = start_row + i
-                typ   = r.get("Type", "")
-                prod  = r.get("Product", "")
-                datev = r.get("Event Date (if applicable)", "")
-                charge = r.get("Cost", None)
-                qty = 1
-                details = r.get("F2F or Online?", "")
-
-                if not details and costs_df is not None:
-                    k = (str(typ).strip(), _apply_product_aliases(str(prod).strip()))
-                    details = f2f_map.get(k, "")
-
-                if c_Type:   ws.cell(rr, c_Type, typ)
-                if c_Prod:   ws.cell(rr, c_Prod, prod)
-                if c_Det:    ws.cell(rr, c_Det, details)
-                if c_Date:   ws.cell(rr, c_Date, datev)
-                if c_Qty:    ws.cell(rr, c_Qty, qty)
-                if c_Charge:
-                    ws.cell(rr, c_Charge, charge).number_format = ACC_FMT
-                if c_Total:
-                    try:
-                        total_val = (qty or 0) * (float(charge) if charge not in [None, ""] else 0.0)
-                    except Exception:
-                        total_val = None
-                    ws.cell(rr, c_Total, total_val).number_format = ACC_FMT
-                if c_Notes:
-                    ws.cell(rr, c_Notes, None)
-
-            # Dotted borders
-            last_row = start_row + max(n - 1, 0)
-            table_cols = [c for c in [c_Type,c_Prod,c_Det,c_Date,c_Charge,c_Qty,c_Total,c_Notes] if c]
-            first_col, last_col = min(table_cols), max(table_cols)
-            dotted_b = Border(top=dotted, bottom=dotted, left=dotted, right=dotted)
-            for r in range(hdr_row, last_row + 1):
-                for c in range(first_col, last_col + 1):
-                    ws.cell(r, c).border = dotted_b
-
-            # ---------- Summary block ----------
-            ACC = ACC_FMT
-            sum_col = c_Total if c_Total else c_Charge
-            if sum_col:
-                sum_rng = f"{get_column_letter(sum_col)}{start_row}:{get_column_letter(sum_col)}{last_row}"
-                label_col = None
-                for c in range(1, ws.max_column + 1):
-                    for rr in range(last_row + 1, min(ws.max_row, last_row + 200) + 1):
-                        v = ws.cell(rr, c).value
-                        if v and _canon_label(v) == _canon_label("Total Package"):
-                            label_col = c; break
-                    if label_col: break
-                if not label_col: label_col = 8
-                value_col = label_col + 1
-                search_start = last_row + 1
-                search_end   = min(ws.max_row, last_row + 200)
-
-                r_tp, _ = _find_label_in_column(ws, "Total Package", label_col, search_start, search_end)
-                tp_coord = None
-                if r_tp:
-                    tp_cell = _first_value_cell_right(ws, r_tp, label_col)
-                    tp_cell.value = f"=SUM({sum_rng})"; tp_cell.number_format = ACC
-                    tp_coord = tp_cell.coordinate
-
-                r_disc, _ = _find_label_in_column(ws, "Discount", label_col, search_start, search_end)
-                disc_coord = None
-                if r_disc:
-                    disc_cell = _first_value_cell_right(ws, r_disc, label_col)
-                    if disc_cell.value is None: disc_cell.value = 0
-                    disc_cell.number_format = ACC
-                    disc_coord = disc_cell.coordinate
-
-                r_tpp, _ = _find_label_in_column(ws, "Total Package Price", label_col, search_start, search_end)
-                tpp_coord = None
-                if r_tpp and tp_coord and disc_coord:
-                    tpp_cell = _first_value_cell_right(ws, r_tpp, label_col)
-                    tpp_cell.value = f"={tp_coord}-{disc_coord}"; tpp_cell.number_format = ACC
-                    tpp_coord = tpp_cell.coordinate
-
-                r_vat, _ = _find_label_in_column(ws, "VAT", label_col, search_start, search_end)
-                vat_coord = None
-                if r_vat and tpp_coord:
-                    vat_cell = _first_value_cell_right(ws, r_vat, label_col)
-                    vat_cell.value = f"={tpp_coord}/5"; vat_cell.number_format = ACC
-                    vat_coord = vat_cell.coordinate
-
-                r_opp, _ = _find_label_in_column(ws, "Overall Package Price", label_col, search_start, search_end)
-                if not r_opp and r_vat: r_opp = r_vat + 2
-                if r_opp and tpp_coord and vat_coord:
-                    opp_cell = ws.cell(r_opp, value_col)
-                    opp_cell.value = f"={tpp_coord}+{vat_coord}"; opp_cell.number_format = ACC
-
-            # ---------- Notes sheet (Q&A, unwrapped) ----------
-            notes_ws = _get_notes_ws(wb)
-            q1_label = MAIN_NOTES_QUESTIONS[0]
-            q2_label = MAIN_NOTES_QUESTIONS[1]
-            notes_ws["A2"].value = q1_label; notes_ws["A2"].alignment = Alignment(wrap_text=False, vertical="top")
-            notes_ws["A3"].value = q2_label; notes_ws["A3"].alignment = Alignment(wrap_text=False, vertical="top")
-
-            def _first_nonempty(colname):
-                if colname not in dfp.columns: return ""
-                for s in dfp[colname].astype(str).tolist():
-                    if s and s.strip() and s.strip().lower() != "nan":
-                        return s.strip()
-                return ""
-
-            ans1 = _first_nonempty("_note_q1")
-            ans2 = _first_nonempty("_note_q2")
-            notes_ws["B2"].value = ans1 if ans1 else None
-            notes_ws["B3"].value = ans2 if ans2 else None
-            notes_ws["B2"].alignment = Alignment(wrap_text=False, vertical="top")
-            notes_ws["B3"].alignment = Alignment(wrap_text=False, vertical="top")
-
-            # Save file
-            out_bytes = BytesIO()
-            wb.save(out_bytes); out_bytes.seek(0)
-            safe_provider = re.sub(r'[^A-Za-z0-9 _.-]+', '_', prov or "Unknown_Provider")
-            safe_contact  = re.sub(r'[^A-Za-z0-9 _.-]+', '_', nm or "Unknown_Contact")
-            zf.writestr(f"templates/{safe_provider} - {safe_contact} - WISHLIST.xlsx", out_bytes.getvalue())
-
-    zip_buf.seek(0)
-    return zip_buf
+    groups = cleaned.groupby('_ridx', dropna=False)
+    total = groups.ngroups
+    # Report roughly every 1% so large exports don't rerender the progress bar per workbook
+    report_every = max(1, -(-total // 100))
+    # one workbook per ORIGINAL Zoho row (_ridx)
+    for i_grp, (ridx, dfp) in enumerate(groups, 1):
+        wb = load_workbook(BytesIO(template_bytes))
+        ws = wb.active
+
+        # Pull repeated fields from the first row of this submission
+        prov = "" if 'Provider Name' not in dfp.columns else ("" if pd.isna(dfp['Provider Name'].iloc[0]) else str(dfp['Provider Name'].iloc[0]))
+        nm   = _sanitize_name(dfp['Name'].iloc[0] if 'Name' in dfp.columns and len(dfp) else "")
+        ph   = "" if 'Phone' not in dfp.columns else ("" if pd.isna(dfp['Phone'].iloc[0]) else str(dfp['Phone'].iloc[0]))
+        em   = "" if 'Email' not in dfp.columns else ("" if pd.isna(dfp['Email'].iloc[0]) else str(dfp['Email'].iloc[0]))
+        wti  = dfp['When To Invoice'].iloc[0] if 'When To Invoice' in dfp.columns else ""
+
+        ws['B4'] = prov
+        ws['B6'] = nm
+        ws['D4'] = wti
+        ws['D6'] = ph
+        ws['F6'] = em
+
+        # Secondary contacts
+        def _first(dfcol):
+            return (dfcol.iloc[0] if dfcol is not None and len(dfp) else "")
+        if 'Events Name' in dfp.columns: ws['B10'] = _first(dfp['Events Name'])
+        if 'Events Email' in dfp.columns: ws['B12'] = _first(dfp['Events Email'])
+        if 'Marketing Publications Name' in dfp.columns: ws['D10'] = _first(dfp['Marketing Publications Name'])
+        if 'Marketing Publications Email' in dfp.columns: ws['D12'] = _first(dfp['Marketing Publications Email'])
+        if 'Invoice Name' in dfp.columns: ws['F10'] = _first(dfp['Invoice Name'])
+        if 'Invoice Email' in dfp.columns: ws['F12'] = _first(dfp['Invoice Email'])
+        if 'Copy Name' in dfp.columns: ws['H10'] = _first(dfp['Copy Name'])
+        if 'Copy Email' in dfp.columns: ws['H12'] = _first(dfp['Copy Email'])
+
+        # Find table header
+        hdr_row, hdr_col, hmap = _find_table_header_row(ws)
+        c_Type   = _get_col(hmap, "Type")
+        c_Prod   = _get_col(hmap, "Product")
+        c_Det    = _get_col(hmap, "Details")
+        c_Date   = _get_col(hmap, "Date")
+        c_Charge = _get_col(hmap, "Charge", aliases=("Cost","Price"))
+        c_Qty    = _get_col(hmap, "Qty", aliases=("Quantity",))
+        c_Total  = _get_col(hmap, "Total")
+        c_Notes  = _get_col(hmap, "Notes")
+
+        # White header font
+        for c in [c_Type,c_Prod,c_Det,c_Date,c_Charge,c_Qty,c_Total,c_Notes]:
+            if c: ws.cell(hdr_row, c).font = header_font
+
+        # Insert enough rows
+        start_row = hdr_row + 1
+        n = len(dfp)
+        if n > 1:
+            ws.insert_rows(start_row + 1, amount=n - 1)
+
+        # Fill rows
+        for i, (_, r) in enumerate(dfp.iterrows()):
+            rr = start_row + i
+            typ   = r.get("Type", "")
+            prod  = r.get("Product", "")
+            datev = r.get("Event Date (if applicable)", "")
+            charge = r.get("Cost", None)
+            qty = 1
+            details = r.get("F2F or Online?", "")
+
+            if not details and costs_df is not None:
+                k = (str(typ).strip(), _apply_product_aliases(str(prod).strip()))
+                details = f2f_map.get(k, "")
+
+            if c_Type:   ws.cell(rr, c_Type, typ)
+            if c_Prod:   ws.cell(rr, c_Prod, prod)
+            if c_Det:    ws.cell(rr, c_Det, details)
+            if c_Date:   ws.cell(rr, c_Date, datev)
+            if c_Qty:    ws.cell(rr, c_Qty, qty)
+            if c_Charge:
+                ws.cell(rr, c_Charge, charge).number_format = ACC_FMT
+            if c_Total:
+                try:
+                    total_val = (qty or 0) * (float(charge) if charge not in [None, ""] else 0.0)
+                except Exception:
+                    total_val = None
+                ws.cell(rr, c_Total, total_val).number_format = ACC_FMT
+            if c_Notes:
+                ws.cell(rr, c_Notes, None)
+
+        # Dotted borders
+        last_row = start_row + max(n - 1, 0)
+        table_cols = [c for c in [c_Type,c_Prod,c_Det,c_Date,c_Charge,c_Qty,c_Total,c_Notes] if c]
+        first_col, last_col = min(table_cols), max(table_cols)
+        dotted_b = Border(top=dotted, bottom=dotted, left=dotted, right=dotted)
+        for r in range(hdr_row, last_row + 1):
+            for c in range(first_col, last_col + 1):
+                ws.cell(r, c).border = dotted_b
+
+        # ---------- Summary block ----------
+        ACC = ACC_FMT
+        sum_col = c_Total if c_Total else c_Charge
+        if sum_col:
+            sum_rng = f"{get_column_letter(sum_col)}{start_row}:{get_column_letter(sum_col)}{last_row}"
+            label_col = None
+            for c in range(1, ws.max_column + 1):
+                for rr in range(last_row + 1, min(ws.max_row, last_row + 200) + 1):
+                    v = ws.cell(rr, c).value
+                    if v and _canon_label(v) == _canon_label("Total Package"):
+                        label_col = c; break
+                if label_col: break
+            if not label_col: label_col = 8
+            value_col = label_col + 1
+            search_start = last_row + 1
+            search_end   = min(ws.max_row, last_row + 200)
+
+            r_tp, _ = _find_label_in_column(ws, "Total Package", label_col, search_start, search_end)
+            tp_coord = None
+            if r_tp:
+                tp_cell = _first_value_cell_right(ws, r_tp, label_col)
+                tp_cell.value = f"=SUM({sum_rng})"; tp_cell.number_format = ACC
+                tp_coord = tp_cell.coordinate
+
+            r_disc, _ = _find_label_in_column(ws, "Discount", label_col, search_start, search_end)
+            disc_coord = None
+            if r_disc:
+                disc_cell = _first_value_cell_right(ws, r_disc, label_col)
+                if disc_cell.value is None: disc_cell.value = 0
+                disc_cell.number_format = ACC
+                disc_coord = disc_cell.coordinate
+
+            r_tpp, _ = _find_label_in_column(ws, "Total Package Price", label_col, search_start, search_end)
+            tpp_coord = None
+            if r_tpp and tp_coord and disc_coord:
+                tpp_cell = _first_value_cell_right(ws, r_tpp, label_col)
+                tpp_cell.value = f"={tp_coord}-{disc_coord}"; tpp_cell.number_format = ACC
+                tpp_coord = tpp_cell.coordinate
+
+            r_vat, _ = _find_label_in_column(ws, "VAT", label_col, search_start, search_end)
+            vat_coord = None
+            if r_vat and tpp_coord:
+                vat_cell = _first_value_cell_right(ws, r_vat, label_col)
+                vat_cell.value = f"={tpp_coord}/5"; vat_cell.number_format = ACC
+                vat_coord = vat_cell.coordinate
+
+            r_opp, _ = _find_label_in_column(ws, "Overall Package Price", label_col, search_start, search_end)
+            if not r_opp and r_vat: r_opp = r_vat + 2
+            if r_opp and tpp_coord and vat_coord:
+                opp_cell = ws.cell(r_opp, value_col)
+                opp_cell.value = f"={tpp_coord}+{vat_coord}"; opp_cell.number_format = ACC
+
+        # ---------- Notes sheet (Q&A, unwrapped) ----------
+        notes_ws = _get_notes_ws(wb)
+        q1_label = MAIN_NOTES_QUESTIONS[0]
+        q2_label = MAIN_NOTES_QUESTIONS[1]
+        notes_ws["A2"].value = q1_label; notes_ws["A2"].alignment = Alignment(wrap_text=False, vertical="top")
+        notes_ws["A3"].value = q2_label; notes_ws["A3"].alignment = Alignment(wrap_text=False, vertical="top")
+
+        def _first_nonempty(colname):
+            if colname not in dfp.columns: return ""
+            for s in dfp[colname].astype(str).tolist():
+                if s and s.strip() and s.strip().lower() != "nan":
+                    return s.strip()
+            return ""
+
+        ans1 = _first_nonempty("_note_q1")
+        ans2 = _first_nonempty("_note_q2")
+        notes_ws["B2"].value = ans1 if ans1 else None
+        notes_ws["B3"].value = ans2 if ans2 else None
+        notes_ws["B2"].alignment = Alignment(wrap_text=False, vertical="top")
+        notes_ws["B3"].alignment = Alignment(wrap_text=False, vertical="top")
+
+        # Save file
+        out_bytes = BytesIO()
+        wb.save(out_bytes); out_bytes.seek(0)
+        safe_provider = re.sub(r'[^A-Za-z0-9 _.-]+', '_', prov or "Unknown_Provider")
+        safe_contact  = re.sub(r'[^A-Za-z0-9 _.-]+', '_', nm or "Unknown_Contact")
+        zf.writestr(f"templates/{safe_provider} - {safe_contact} - WISHLIST.xlsx", out_bytes.getvalue())
+        if progress_callback and (i_grp % report_every == 0 or i_grp == total):
+            progress_callback(i_grp / total)
 
 # ===========================
 # Streamlit App (Wishlist only)
@@ -673,10 +719,18 @@ if st.button("Submit", key="submit_wishlist"):
         st.error("Please upload the Zoho Forms export, MOF Cost Sheet, and the new Template.")
     else:
         with st.spinner("Processing..."):
+            prog = st.progress(0.0, text="Cleaning form data...")
             try:
                 form_df = _read_any_table(form_file, preferred_sheet_name="Form")
                 costs_df = _read_any_table(cost_file)
-                cleaned_internal = transform_wishlist(form_df, costs_df)  # includes _ridx + _note_q1/_note_q2
+                if form_df.shape[0] > CHUNK_THRESHOLD_ROWS:
+                    cleaned_internal = transform_wishlist_chunked(  # includes _ridx + _note_q1/_note_q2
+                        form_df, costs_df,
+                        progress_callback=lambda f: prog.progress(0.5 * f, text="Cleaning form data..."),
+                    )
+                else:
+                    cleaned_internal = transform_wishlist(form_df, costs_df)  # includes _ridx + _note_q1/_note_q2
+                del form_df
             except Exception as e:
                 st.exception(e)
                 st.stop()
@@ -690,16 +744,18 @@ if st.button("Submit", key="submit_wishlist"):
                 cleaned_to_export.to_excel(cleaned_bytes, index=False)
                 zf.writestr("data/cleaned_output.xlsx", cleaned_bytes.getvalue())
 
+                prog.progress(0.5, text="Populating templates...")
                 try:
                     template_bytes = template_file.read()
-                    tpl_zip = _populate_template_bytes(template_bytes, cleaned_internal, costs_df)
-                    with zipfile.ZipFile(tpl_zip, 'r') as tplzf:
-                        for info in tplzf.infolist():
-                            zf.writestr(info.filename, tplzf.read(info.filename))
+                    _write_templates(
+                        zf, template_bytes, cleaned_internal, costs_df,
+                        progress_callback=lambda f: prog.progress(0.5 + 0.5 * f, text="Populating templates..."),
+                    )
                 except Exception as e:
                     st.exception(RuntimeError(f"Template population failed: {e}"))
 
             zip_buf.seek(0)
+            prog.progress(1.0, text="Done")
             num_templates = cleaned_internal['_ridx'].nunique()
             st.success(f"Done. Cleaned {len(cleaned_to_export)} rows across {num_templates} submission template(s).")
 
@@ -4,6 +4,7 @@ import numpy as np
 import pandas as pd
 import streamlit as st
 from datetime import datetime
+from types import MappingProxyType
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.utils.cell import range_boundaries
@@ -16,21 +17,28 @@ st.title("Quarterly MI Builder (Protection & GI)")
 # --------------------------------------
 # Provider theme rules (header + titles)
 # --------------------------------------
+_DEFAULT_THEME = MappingProxyType({"header_fill": "000000", "title_font_color": "FFFFFF"})
+
+def _build_provider_themes():
+    rules = [
+        (("aviva",), "FBDB04", "1151AD"),
+        (("cirencester", "circencester", "cirencester friendly"), "9A268C", "FFFFFF"),
+        (("guardian",), "FFC000", "000000"),  # UPDATED: Guardian branding
+        (("lv", "lv="), "00B050", "FFFFFF"),
+        (("payment shield", "paymentshield", "payment-shield"), "000000", "FFFFFF"),
+    ]
+    themes = {}
+    for aliases, fill, font_color in rules:
+        theme = MappingProxyType({"header_fill": fill, "title_font_color": font_color})
+        for alias in aliases:
+            themes[alias] = theme
+    return MappingProxyType(themes)
+
+# Built once at import; every alias points at the same read-only theme
+_PROVIDER_THEMES = _build_provider_themes()
+
 def provider_theme(name: str):
-    key = (name or "").strip().lower()
-    theme = {"header_fill": "000000", "title_font_color": "FFFFFF"}
-    if key == "aviva":
-        theme["header_fill"] = "FBDB04"; theme["title_font_color"] = "1151AD"
-    elif key in ["cirencester", "circencester", "cirencester friendly"]:
-        theme["header_fill"] = "9A268C"; theme["title_font_color"] = "FFFFFF"
-    elif key == "guardian":
-        # UPDATED: Guardian branding
-        theme["header_fill"] = "FFC000"; theme["title_font_color"] = "000000"
-    elif key in ["lv", "lv="]:
-        theme["header_fill"] = "00B050"; theme["title_font_color"] = "FFFFFF"
-    elif key in ["payment shield", "paymentshield", "payment-shield"]:
-        theme["header_fill"] = "000000"; theme["title_font_color"] = "FFFFFF"
-    return theme
+    return _PROVIDER_THEMES.get((name or "").strip().lower(), _DEFAULT_THEME)
 
 # --------------------
 # Data load + cleanup
@@ -125,15 +133,21 @@ def network_provider_table(df: pd.DataFrame) -> pd.DataFrame:
     cnt_total = float(cnt_by_p.sum())
     cnt_pct = (cnt_by_p / cnt_total * 100.0) if cnt_total > 0 else cnt_by_p * 0.0
 
+    api_vals = api_pct.values.round(2)
+    order = np.argsort(-api_vals, kind="stable")
     out = pd.DataFrame({
-        "Provider": api_pct.index,
-        "API (%)": api_pct.values.round(2),
-        "Product %": cnt_pct.reindex(api_pct.index).values.round(2)
-    }).sort_values("API (%)", ascending=False).reset_index(drop=True)
-
-    # Force Grand Total to exactly 100.00%
-    out.loc[len(out)] = ["Grand Total", 100.0 if api_total > 0 else 0.0, 100.0 if cnt_total > 0 else 0.0]
-    return out
+        "Provider": api_pct.index.values[order],
+        "API (%)": api_vals[order],
+        "Product %": cnt_pct.reindex(api_pct.index).values.round(2)[order]
+    })
+
+    # Force Grand Total to exactly 100.00% (separate frame keeps the % columns float)
+    gt = pd.DataFrame({
+        "Provider": ["Grand Total"],
+        "API (%)": [100.0 if api_total > 0 else 0.0],
+        "Product %": [100.0 if cnt_total > 0 else 0.0]
+    })
+    return pd.concat([out, gt], ignore_index=True)
 
 def network_subtype_by_month_table(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -1,7 +1,14 @@
 # streamlit_app.py
+import functools
+import io
 import logging
 import gc
+import re
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 import streamlit as st
 
 # ---- A) Quieter logs ----
@@ -137,6 +144,17 @@ OUTPUT_ORDER = [
     "N clients",
 ]
 
+# Few distinct values per column: stored as category so to_csv writes from a small lookup
+LOW_CARDINALITY_COLS = frozenset({
+    "Country", "County", "Regulated", "Case type", "Case status",
+    "Mortgage status", "Term unit", "Reminder status", "Lender name", "Status",
+})
+
+# Membership sets built once; CC fields that make it into the output, in output order
+_OUTPUT_ORDER_SET = frozenset(OUTPUT_ORDER)
+_EXTRA_SET = frozenset(EXTRA_HEADERS)
+_NEEDED_FROM_CC = tuple(c for c in OUTPUT_ORDER if c in _EXTRA_SET)
+
 RR_EXPECTED_COLS = [
     "Advisor name",
     "Case id",
@@ -150,45 +168,130 @@ RR_EXPECTED_COLS = [
     "Reminder status",
 ]
 
-def read_any(file) -> pd.DataFrame:
-    if file is None:
-        return None
-    name = file.name.lower()
+# CSVs above this size are converted batch by batch so the full Arrow table never
+# sits in memory next to the pandas frame built from it
+LARGE_CSV_BYTES = 50_000_000
+
+def _read_csv_batches(data: bytes, convert_options) -> pd.DataFrame:
+    reader = pa_csv.open_csv(io.BytesIO(data), convert_options=convert_options)
+    frames = [batch.to_pandas(types_mapper=pd.ArrowDtype) for batch in reader]
+    if not frames:
+        return reader.schema.empty_table().to_pandas(types_mapper=pd.ArrowDtype)
+    return pd.concat(frames, ignore_index=True)
+
+def _is_wanted(col, keep: frozenset) -> bool:
+    # Same two keys build_lookup indexes a column under
+    return norm(col) in keep or str(col).lower() in keep
+
+def _read_csv_arrow(data: bytes, keep: frozenset | None) -> pd.DataFrame:
+    header = pa_csv.open_csv(io.BytesIO(data)).schema.names
+    include = [c for c in header if _is_wanted(c, keep)] if keep else header
+    # Every column is read as text, so values reach the output CSV exactly as uploaded
+    # (no timestamp/number inference rewriting e.g. ISO "...Z" times)
+    convert_options = pa_csv.ConvertOptions(
+        column_types={c: pa.string() for c in include},
+        strings_can_be_null=True,
+        include_columns=include,
+    )
+    if len(data) > LARGE_CSV_BYTES:
+        return _read_csv_batches(data, convert_options)
+    table = pa_csv.read_csv(io.BytesIO(data), convert_options=convert_options)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def read_any(data: bytes, name: str, keep: frozenset | None = None) -> pd.DataFrame:
+    """
+    Parse an upload. If `keep` (normalised column names) is given, only matching
+    columns are parsed at all; everything else is skipped by the reader.
+    """
+    # Keyed on the raw upload bytes, so re-clicking "Generate report" skips the parse
+    usecols = (lambda c: _is_wanted(c, keep)) if keep else None
     if name.endswith(".csv"):
-        return pd.read_csv(file)
+        try:
+            return _read_csv_arrow(data, keep)
+        except pa.ArrowInvalid:
+            # Arrow rejects some files pandas copes with (e.g. short rows); read those as text too
+            return pd.read_csv(io.BytesIO(data), dtype=str, usecols=usecols)
     if name.endswith(".xlsx") or name.endswith(".xls"):
-        return pd.read_excel(file)
+        return pd.read_excel(io.BytesIO(data), engine="calamine", usecols=usecols)
     raise ValueError("Unsupported file type. Please upload CSV or Excel.")
 
+_CAMEL_SPLIT_RE = re.compile(r"(?<=[a-z])(?=[A-Z])")
+
+@functools.lru_cache(maxsize=4096)
 def norm(s: str) -> str:
-    return " ".join(str(s).strip().replace("_", " ").split()).lower()
+    # "Case id", "Case ID", "case_id" and "CaseId" all normalise to "case id"
+    s = _CAMEL_SPLIT_RE.sub(" ", str(s))
+    return " ".join(s.strip().replace("_", " ").split()).lower()
 
 def build_lookup(cols):
-    return {norm(c): c for c in cols}
+    lookup = {norm(c): c for c in cols}
+    # Plain lowercased names as well, so exact-but-for-case hits need no normalising
+    for c in cols:
+        lookup.setdefault(str(c).lower(), c)
+    return lookup
 
 def find_col(lookup: dict, target_name: str, alt_variants=None):
+    hit = lookup.get(target_name.lower())
+    if hit:
+        return hit
     candidates = [target_name] + (alt_variants or [])
-    t = target_name
-    if " id" in t.lower():
-        candidates += [t.replace(" id", " ID"), t.replace(" id", " Id")]
     for c in candidates:
         hit = lookup.get(norm(c))
         if hit:
             return hit
     return None
 
+# Static target columns, normalised once at import
+_RR_EXPECTED_NORM = [(c, norm(c)) for c in RR_EXPECTED_COLS]
+_CC_REQUIRED_NORM = [(c, norm(c)) for c in CC_REQUIRED_BASE]
+
+# Columns worth parsing from each upload (everything else is dropped at read time)
+RR_READ_KEYS = frozenset([n for _, n in _RR_EXPECTED_NORM] + [norm(JOIN_KEY)])
+CC_READ_KEYS = frozenset([n for _, n in _CC_REQUIRED_NORM] + [norm(JOIN_KEY)])
+
 def clean_iso_date_to_ddmmyyyy(series: pd.Series) -> pd.Series:
     s = series.astype(str).str.strip()
-    s = s.str.replace(r"T.*$", "", regex=True)
-    dt = pd.to_datetime(s, errors="coerce", dayfirst=True)
+    # Acre exports are ISO (YYYY-MM-DDTHH:MM:SSZ): fixed slice + explicit format stays on the C path
+    dt = pd.to_datetime(s.str.slice(0, 10), format="%Y-%m-%d", errors="coerce", cache=True)
+    rest = dt.isna() & series.notna()
+    if rest.any():
+        dt.loc[rest] = pd.to_datetime(s[rest], errors="coerce", dayfirst=True)
     return dt.dt.strftime("%d/%m/%Y").fillna("")
 
-def safe_merge(rr: pd.DataFrame, cc: pd.DataFrame):
+def _arrow_str(series: pd.Series):
+    # Arrow-backed columns (CSV path) convert without a copy; Excel/object columns go via StringDtype
+    if isinstance(series.dtype, pd.ArrowDtype):
+        return pa.array(series).cast(pa.string())
+    return pa.array(series.astype("string"), type=pa.string())
+
+def full_name(first: pd.Series, last: pd.Series) -> pd.Series:
+    """Trimmed "First Last" in one Arrow kernel chain; a missing part counts as blank."""
+    joined = pc.binary_join_element_wise(
+        pc.utf8_trim_whitespace(_arrow_str(first)),
+        pc.utf8_trim_whitespace(_arrow_str(last)),
+        " ",
+        null_handling="replace",
+        null_replacement="",
+    )
+    return pd.Series(pc.utf8_trim_whitespace(joined), index=first.index, dtype=pd.ArrowDtype(pa.string()))
+
+def _join_key(series: pd.Series) -> pd.Series:
+    # CSV uploads are read as text but Excel ids come back numeric; compare both as text,
+    # with whole-number floats (ids next to blanks) written without a trailing ".0"
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        try:
+            series = series.astype("Int64")
+        except (TypeError, ValueError):
+            pass
+    return series.astype("string")
+
+def safe_merge(rr: pd.DataFrame, cc: pd.DataFrame, dedupe_cc: bool = True):
     rr_lk = build_lookup(rr.columns)
     cc_lk = build_lookup(cc.columns)
 
-    rr_key = find_col(rr_lk, JOIN_KEY, alt_variants=["Case ID", "case id", "CaseId"])
-    cc_key = find_col(cc_lk, JOIN_KEY, alt_variants=["Case ID", "case id", "CaseId"])
+    rr_key = find_col(rr_lk, JOIN_KEY)
+    cc_key = find_col(cc_lk, JOIN_KEY)
     if rr_key is None or cc_key is None:
         missing_side = []
         if rr_key is None:
@@ -203,72 +306,86 @@ def safe_merge(rr: pd.DataFrame, cc: pd.DataFrame):
     # Map CC columns we need
     cc_map = {}
     missing_in_cc = []
-    for base in CC_REQUIRED_BASE:
-        col = find_col(cc_lk, base)
+    for base, key in _CC_REQUIRED_NORM:
+        col = cc_lk.get(key)
         if col is None:
             missing_in_cc.append(base)
         else:
             cc_map[base] = col
 
+    # Build canonical CC output only for fields needed in final output: a single
+    # column projection that also renames the key to "__cc_key" for the join.
+    # Headers missing from CC are filled with NA at output assembly, not here.
+    present = [h for h in _NEEDED_FROM_CC if h in cc_map]
+    cc_out = cc[[cc_key] + [cc_map[h] for h in present]].rename(
+        columns={cc_key: "__cc_key", **dict(zip([cc_map[h] for h in present], present))}
+    )
+
     # Compute Full name
     first_col = cc_map.get("First name")
     last_col  = cc_map.get("Last name")
-    cc_subset = cc[[cc_key] + [v for k, v in cc_map.items() if k not in ("First name","Last name")]].copy()
     if first_col is None or last_col is None:
-        cc_subset["Full name"] = ""
+        cc_out["Full name"] = ""
     else:
-        cc_subset["Full name"] = (
-            cc[first_col].fillna("").astype(str).str.strip() + " " +
-            cc[last_col].fillna("").astype(str).str.strip()
-        ).str.strip()
-
-    # Build canonical CC output only for fields needed in final output
-    needed_from_cc = list(set(OUTPUT_ORDER) & set(EXTRA_HEADERS))
-    source = {k: cc[v] for k, v in cc_map.items() if k not in ("First name", "Last name")}
-    source["Full name"] = cc_subset["Full name"]
-
-    cc_out = pd.DataFrame()
-    cc_out[cc_key] = cc[cc_key]
-    for h in needed_from_cc:
-        cc_out[h] = source.get(h, pd.NA)
-
-    # Merge (left join keeps all RR rows; duplicates in CC may expand rows)
-    merged = rr.merge(
-        cc_out,
-        left_on=rr_key,
-        right_on=cc_key,
-        how="left",
-        indicator=True
-    )
+        # Same index as cc_out, so skip alignment
+        cc_out["Full name"] = full_name(cc[first_col], cc[last_col]).array
 
-    # Case URL built from RR join key
-    merged["Case URL"] = "https://crm.myac.re/cases/" + merged[rr_key].astype(str).str.strip() + "/overview"
+    # One CC row per case keeps the left join from multiplying RR rows (e.g. joint applications)
+    if dedupe_cc:
+        cc_out = cc_out.drop_duplicates(subset=["__cc_key"], keep="first")
+
+    # Factorize both keys together so the join probes int codes rather than key strings
+    codes, _ = pd.factorize(
+        pd.concat([_join_key(rr[rr_key]), _join_key(cc_out["__cc_key"])], ignore_index=True), sort=False
+    )
+    n_rr = len(rr)
+    rr_codes, cc_codes = codes[:n_rr], codes[n_rr:]
+
+    # "__cc_key" is null exactly on rows with no CC match
+    if pd.Index(cc_codes).is_unique and rr.columns.intersection(cc_out.columns).empty:
+        # One CC row per case: a single positional gather replaces the merge
+        cc_rows = cc_out.set_index(cc_codes).reindex(rr_codes)
+        cc_rows.index = rr.index
+        merged = pd.concat([rr, cc_rows], axis=1)
+    else:
+        # Merge (left join keeps all RR rows; duplicates in CC may expand rows)
+        merged = rr.assign(__k=rr_codes).merge(
+            cc_out.assign(__k=cc_codes),
+            on="__k",
+            how="left"
+        ).drop(columns="__k")
+
+    # Case URL built from RR join key (left blank where the RR row has no Case id)
+    ids = np.char.strip(merged[rr_key].to_numpy(dtype=object).astype(str))
+    urls = np.char.add(np.char.add("https://crm.myac.re/cases/", ids), "/overview")
+    merged["Case URL"] = np.where(merged[rr_key].notna().to_numpy(), urls, "")
 
     # Ensure "Case id" column exists canonically
     if "Case id" not in merged.columns:
         merged["Case id"] = merged[rr_key]
 
-    # Build final dataframe in requested order (map RR columns if they differ by case/spacing)
-    rr_mapped_cols = {c: find_col(rr_lk, c) for c in RR_EXPECTED_COLS}
-    final_df = pd.DataFrame()
-    for col in OUTPUT_ORDER:
-        if col in merged.columns:
-            final_df[col] = merged[col]
-        elif col in rr_mapped_cols and rr_mapped_cols[col] in merged.columns:
-            final_df[col] = merged[rr_mapped_cols[col]]
-        else:
-            final_df[col] = pd.NA
+    # Build final dataframe in requested order (map RR columns if they differ by case/spacing):
+    # rename RR spellings to canonical names, then one reindex gathers the columns
+    # and fills anything absent with NA
+    rr_mapped_cols = {c: rr_lk[n] for c, n in _RR_EXPECTED_NORM if n in rr_lk}
+    merged_cols = set(merged.columns)
+    rename_map = {
+        v: k for k, v in rr_mapped_cols.items()
+        if v in merged_cols and k not in merged_cols
+    }
+    final_df = merged.rename(columns=rename_map).reindex(columns=OUTPUT_ORDER)
 
     # Date cleaning
     for date_col in ["Mtg completion date", "Current reminder date"]:
         if date_col in final_df.columns:
             final_df[date_col] = clean_iso_date_to_ddmmyyyy(final_df[date_col])
 
+    for col in LOW_CARDINALITY_COLS & _OUTPUT_ORDER_SET:
+        final_df[col] = final_df[col].astype("category")
+
     # Metrics
-    matched = int((merged["_merge"] == "both").sum()) if "_merge" in merged.columns else None
+    matched = int(merged["__cc_key"].notna().sum())
     total = len(merged)
-    if "_merge" in merged.columns:
-        merged = merged.drop(columns=["_merge"])
 
     return final_df, {
         "rr_key": rr_key,
@@ -278,8 +395,26 @@ def safe_merge(rr: pd.DataFrame, cc: pd.DataFrame):
         "missing_in_cc": missing_in_cc
     }
 
-def generate_download(df: pd.DataFrame, default_name="mortgage_rate_review_pii.csv"):
-    csv_bytes = df.to_csv(index=False).encode("utf-8-sig")
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    # Write encoded bytes straight into the buffer rather than building a str and re-encoding it
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False, encoding="utf-8-sig", lineterminator="\n")
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def pipeline(rr_bytes: bytes, rr_name: str, cc_bytes: bytes, cc_name: str, dedupe_cc: bool = True) -> tuple[bytes, dict]:
+    """Read both uploads, merge them and write the CSV; cached on the raw file bytes."""
+    rr_df = read_any(rr_bytes, rr_name, keep=RR_READ_KEYS)
+    if rr_df.empty:
+        raise ValueError("The Mortgage Rate Review report appears to be empty.")
+    cc_df = read_any(cc_bytes, cc_name, keep=CC_READ_KEYS)
+    if cc_df.empty:
+        raise ValueError("The Combined Case Report appears to be empty.")
+
+    output_df, stats = safe_merge(rr_df, cc_df, dedupe_cc=dedupe_cc)
+    return to_csv_bytes(output_df), stats
+
+def generate_download(csv_bytes: bytes, default_name="mortgage_rate_review_pii.csv"):
     st.download_button(
         label="⬇️ Download Mortgage Rate Review PII CSV",
         data=csv_bytes,
@@ -288,44 +423,43 @@ def generate_download(df: pd.DataFrame, default_name="mortgage_rate_review_pii.c
         use_container_width=True
     )
 
+collapse_dupes = st.checkbox(
+    "Collapse duplicate Case IDs in CC",
+    value=True,
+    help="Keep only the first Combined Case Report row per Case id, so each Rate Review row appears once."
+)
+
 # --- Action button ---
 if st.button("Generate report", type="primary", use_container_width=True):
     if rr_file is None or cc_file is None:
         st.error("Please upload **both** files before generating the report.")
     else:
         try:
-            rr_df = read_any(rr_file)
-            cc_df = read_any(cc_file)
-
-            if rr_df is None or rr_df.empty:
-                st.error("The Mortgage Rate Review report appears to be empty.")
-            elif cc_df is None or cc_df.empty:
-                st.error("The Combined Case Report appears to be empty.")
-            else:
-                with st.spinner("Merging reports…"):
-                    output_df, stats = safe_merge(rr_df, cc_df)
-
-                st.success(
-                    f"Report is ready! Matched {stats['matched']} of {stats['total']} rows by **{JOIN_KEY}**."
+            with st.spinner("Merging reports…"):
+                csv_bytes, stats = pipeline(
+                    rr_file.getvalue(), rr_file.name.lower(),
+                    cc_file.getvalue(), cc_file.name.lower(),
+                    dedupe_cc=collapse_dupes,
+                )
+
+            st.success(
+                f"Report is ready! Matched {stats['matched']} of {stats['total']} rows by **{JOIN_KEY}**."
+            )
+            if stats["missing_in_cc"]:
+                st.warning(
+                    "Some PII fields were missing in the Combined Case Report and were left blank: "
+                    + ", ".join(stats["missing_in_cc"])
                 )
-                if stats["missing_in_cc"]:
-                    st.warning(
-                        "Some PII fields were missing in the Combined Case Report and were left blank: "
-                        + ", ".join(stats["missing_in_cc"])
-                    )
-
-                generate_download(output_df)
-
-                # ---- B) Memory scrub ----
-                try:
-                    del output_df
-                    del rr_df
-                    del cc_df
-                except NameError:
-                    pass
-                gc.collect()
-
-        except KeyError as e:
+
+            generate_download(csv_bytes)
+
+            # ---- B) Memory scrub ----
+            gc.collect()
+
+        except (pa.ArrowInvalid, pd.errors.ParserError, pd.errors.EmptyDataError):
+            # Parser errors subclass ValueError; keep their raw messages away from users
+            st.error("One of the CSV files couldn't be read. Please check it is a valid CSV export and try again.")
+        except (KeyError, ValueError) as e:
             st.error(str(e))
         except Exception:
             st.error("Something went wrong. Please try again or contact support.")
@@ -1,8 +1,49 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import io
 import csv
-import time
+import itertools
+
+# "t"/"f" -> True/False; anything else is left as it was
+_BOOL_MAP = {"t": True, "f": False}
+
+# Every upper/lower-case spelling of the blank placeholders, so a plain isin
+# matches them without lower-casing the whole column first
+_PLACEHOLDERS = frozenset(
+    "".join(chars)
+    for word in ("nan", "none", "null", "nat")
+    for chars in itertools.product(*((c, c.upper()) for c in word))
+)
+
+
+def _ddmmyyyy(parsed: pd.Series) -> np.ndarray:
+    # dd/mm/yyyy built from the integer date parts instead of per-value strftime:
+    # yyyymmdd as one 8-char string, split into characters and reordered
+    # (datetime64[ns] years are always 4 digits)
+    ymd = (parsed.dt.year * 10000 + parsed.dt.month * 100 + parsed.dt.day).to_numpy().astype("U8")
+    chars = ymd.view("U1").reshape(-1, 8)
+    slash = np.full((len(ymd), 1), "/", dtype="U1")
+    text = np.hstack([chars[:, 6:8], slash, chars[:, 4:6], slash, chars[:, :4]])
+    return np.ascontiguousarray(text).view("U10").ravel().astype(object)
+
+
+def _read_arrow_csv(file, read_options=None, parse_options=None) -> pd.DataFrame:
+    # Every column is read as text, so values pass through to the output exactly as
+    # uploaded; the date and boolean clean-ups below work on the text.
+    # Text that isn't valid UTF-8 fails the string conversion with ArrowInvalid
+    header = pa_csv.open_csv(file, read_options=read_options, parse_options=parse_options).schema.names
+    file.seek(0)
+    convert_options = pa_csv.ConvertOptions(
+        column_types={c: pa.string() for c in header},
+        strings_can_be_null=True,
+    )
+    table = pa_csv.read_csv(
+        file, read_options=read_options, parse_options=parse_options, convert_options=convert_options
+    )
+    return table.to_pandas()
 
 st.set_page_config(page_title="Boolean Cleaner", layout="wide")
 st.title("CSV Boolean Cleaner")
@@ -12,30 +53,50 @@ if uploaded_file:
 
     @st.cache_data
     def load_csv(file):
-        # Force these ID columns to stay exact
-        dtype_map = {"Adviser ID": str, "Firm ID": str}
-        # Try UTF-8 first
+        # pyarrow's multithreaded parser, every column as text (IDs stay exact); try UTF-8 first
         try:
-            return pd.read_csv(file, dtype=dtype_map)
+            return _read_arrow_csv(file)
         except Exception:
-            # Fallback for different encodings
+            # Fallback for different encodings: detect from the first 64 KB only
             file.seek(0)
-            raw_bytes = file.read()
-            try:
-                raw_text = raw_bytes.decode("utf-8")
-            except UnicodeDecodeError:
-                raw_text = raw_bytes.decode("latin-1")
-            dialect = csv.Sniffer().sniff(raw_text[:10_000])
+            head = file.read(65536)
+            encoding = "utf-8-sig" if head.startswith(b"\xef\xbb\xbf") else "utf-8"
+            # Pure ASCII is valid UTF-8 as-is; no trial decode needed
+            if not head.isascii():
+                try:
+                    head.decode(encoding)
+                except UnicodeDecodeError as e:
+                    # A multi-byte character cut off at the end of the sample is still UTF-8
+                    if e.reason != "unexpected end of data":
+                        encoding = "latin-1"
+            # The sniffer only counts delimiter candidates: 10 KB of bytes is plenty,
+            # and a character split at the cut is just replaced
+            dialect = csv.Sniffer().sniff(head[:10_000].decode(encoding, errors="replace"))
             sep = dialect.delimiter
-            return pd.read_csv(
-                io.StringIO(raw_text),
-                sep=sep,
-                engine="python",
-                dtype=dtype_map,
-            )
+            file.seek(0)
+            try:
+                return _read_arrow_csv(
+                    file,
+                    read_options=pa_csv.ReadOptions(encoding=encoding),
+                    parse_options=pa_csv.ParseOptions(delimiter=sep),
+                )
+            except pa.ArrowInvalid:
+                # Ragged rows etc. that only the python engine tolerates
+                file.seek(0)
+                try:
+                    return pd.read_csv(file, sep=sep, engine="python", encoding=encoding, dtype=str)
+                except UnicodeDecodeError:
+                    # Non-UTF-8 bytes past the sample; latin-1 decodes anything
+                    file.seek(0)
+                    return pd.read_csv(file, sep=sep, engine="python", encoding="latin-1", dtype=str)
 
     df = load_csv(uploaded_file)
 
+    # Low-cardinality ID columns: categories hold each distinct string once
+    for col in ("Adviser ID", "Firm ID"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
     # --- Date columns to output as TEXT dd/MM/yyyy ---
     date_cols = [
         "Application Date",
@@ -47,65 +108,76 @@ if uploaded_file:
         "Older Version Date",
     ]
 
-    def normalize_date_to_text_ddmmyyyy(series: pd.Series) -> pd.Series:
+    def normalize_date_to_text_ddmmyyyy(series: pd.Series) -> tuple[pd.Series, pd.Series]:
         """
-        Convert to TEXT dd/MM/yyyy.
+        Convert to TEXT dd/MM/yyyy; also returns the parsed datetimes (NaT where unparsed).
         Deterministic parsing:
-          1) ISO yyyy-mm-dd (and yyyy-mm-dd hh:mm:ss) parsed with explicit format (NO guessing)
+          1) ISO yyyy-mm-dd (and yyyy-mm-dd hh:mm:ss) parsed as ISO8601 (NO guessing)
           2) UK dd/mm/yyyy (± time) parsed with dayfirst=True
           3) Excel serial numbers
         Leaves blanks as blanks; keeps unparseable as-is.
         """
         s = series.astype(str).str.strip()
 
-        placeholders = s.str.lower().isin({"nan", "none", "null", "nat"})
+        placeholders = s.isin(_PLACEHOLDERS)
         s = s.mask(placeholders, "")
 
         parsed = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
 
-        # 1) ISO with time: YYYY-MM-DD HH:MM:SS
-        iso_dt_mask = s.str.match(r"^\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}$", na=False)
-        if iso_dt_mask.any():
-            parsed.loc[iso_dt_mask] = pd.to_datetime(
-                s[iso_dt_mask], format="%Y-%m-%d %H:%M:%S", errors="coerce"
+        # 1) ISO: YYYY-MM-DD, optionally followed by HH:MM:SS; one match and one
+        # format="ISO8601" parse cover both layouts (explicit, never day-first)
+        iso_mask = s.str.match(r"^\d{4}-\d{2}-\d{2}(?:\s+\d{2}:\d{2}:\d{2})?$", na=False)
+        if iso_mask.any():
+            parsed.loc[iso_mask] = pd.to_datetime(
+                s[iso_mask].str.replace(r"\s+", " ", regex=True), format="ISO8601", errors="coerce"
             )
 
-        # 2) ISO date only: YYYY-MM-DD
-        iso_d_mask = s.str.match(r"^\d{4}-\d{2}-\d{2}$", na=False)
-        if iso_d_mask.any():
-            parsed.loc[iso_d_mask] = pd.to_datetime(
-                s[iso_d_mask], format="%Y-%m-%d", errors="coerce"
-            )
+        # 2) UK dd/mm/yyyy with an explicit format (C strptime path, no guessing)
+        nonblank = s.ne("")
+        uk_mask = parsed.isna() & nonblank
+        if uk_mask.any():
+            parsed.loc[uk_mask] = pd.to_datetime(s[uk_mask], format="%d/%m/%Y", errors="coerce")
 
-        # 3) UK / anything else (dd/mm/yyyy, with or without time)
-        remaining = parsed.isna() & s.ne("")
+        # 2b) Anything else (dd/mm/yyyy with time, etc.): only the residual takes the slow parser.
+        # format="mixed" parses each value on its own, so a column mixing date-only and
+        # date-time rows no longer NaTs whichever layout isn't inferred from the first row
+        remaining = parsed.isna() & nonblank
         if remaining.any():
-            parsed.loc[remaining] = pd.to_datetime(s[remaining], errors="coerce", dayfirst=True)
+            parsed.loc[remaining] = pd.to_datetime(
+                s[remaining], errors="coerce", dayfirst=True, format="mixed", cache=True
+            )
 
-        # 4) Excel serials for anything still NaT but non-empty
-        still_nat = parsed.isna() & s.ne("")
+        # 3) Excel serials for anything still NaT but non-empty
+        still_nat = parsed.isna() & nonblank
         if still_nat.any():
-            nums = pd.to_numeric(s[still_nat].str.replace(",", ""), errors="coerce")
-            has_num = nums.notna()
-            if has_num.any():
-                parsed.loc[still_nat[still_nat].index[has_num]] = (
-                    pd.to_datetime("1899-12-30") + pd.to_timedelta(nums[has_num], unit="D")
+            # One full-length pass; rows outside still_nat are NaN and never converted
+            nums = pd.to_numeric(s.where(still_nat).str.replace(",", "", regex=False), errors="coerce")
+            serial = nums.notna()
+            if serial.any():
+                parsed = parsed.mask(
+                    serial, pd.Timestamp("1899-12-30") + pd.to_timedelta(nums, unit="D")
                 )
 
-        out = parsed.dt.strftime("%d/%m/%Y")
-        out = out.where(parsed.notna(), s)  # keep original for truly unparseable like 0025-01-02
-        return out.astype(str)
+        # Keep original for truly unparseable like 0025-01-02
+        valid = parsed.notna().to_numpy()
+        out = s.to_numpy(dtype=object).copy()
+        if valid.any():
+            out[valid] = _ddmmyyyy(parsed[valid])
+        return pd.Series(out, index=s.index, dtype=object), parsed
 
+    parsed_app = None
     for col in date_cols:
         if col in df.columns:
-            df[col] = normalize_date_to_text_ddmmyyyy(df[col])
+            df[col], parsed = normalize_date_to_text_ddmmyyyy(df[col])
+            if col == "Application Date":
+                parsed_app = parsed
 
     # --- Sort by Application Date ascending (blanks last) ---
-    if "Application Date" in df.columns:
-        parsed_app = pd.to_datetime(df["Application Date"], errors="coerce", dayfirst=True)
-        df["__app_sort__"] = parsed_app
-        df = df.sort_values(by="__app_sort__", ascending=True, na_position="last")
-        df = df.drop(columns="__app_sort__")
+    if parsed_app is not None:
+        # Reuse the parse from normalisation; day precision, as the text holds no time.
+        # NumPy sorts NaT last, so blanks stay at the bottom without a helper column
+        order = np.argsort(parsed_app.dt.normalize().to_numpy(), kind="stable")
+        df = df.iloc[order]
 
     # --- Boolean cleanup (unchanged) ---
     bool_cols = [
@@ -114,30 +186,34 @@ if uploaded_file:
         "App2 Blank?", "Lending into retirement?", "Second Charge?"
     ]
 
-    def transform_bool(val):
-        if val == "t":
-            return True
-        elif val == "f":
-            return False
-        else:
-            return val
-
-    prog = st.progress(0)
-    status = st.empty()
-    cols_to_do = [c for c in bool_cols if c in df.columns]
-    total_steps = len(cols_to_do) + 1
-    step = 0
-    for col in cols_to_do:
-        df[col] = df[col].apply(transform_bool)
-        step += 1
-        prog.progress(step / total_steps)
-        status.text(f"Transforming “{col}” — ≈ {total_steps-step}s remaining")
-
-    status.text("Generating cleaned CSV…")
-    csv_bytes = df.to_csv(index=False, encoding="utf-8-sig").encode("utf-8-sig")
-    step += 1
-    prog.progress(step / total_steps)
-    status.text("All done!")
+    @st.cache_data(show_spinner=False, max_entries=2)
+    def to_csv_bytes(df):
+        # Keyed on Streamlit's hash of the cleaned frame, so reruns (e.g. the
+        # download click) reuse the encoded bytes instead of serialising again
+        # Encoded straight into a byte buffer: no intermediate str of the whole CSV
+        buf = io.BytesIO()
+        df.to_csv(buf, index=False, encoding="utf-8-sig")
+        return buf.getvalue()
+
+    # One spinner for the whole step rather than per-stage widget updates
+    with st.spinner("Cleaning boolean columns and generating CSV…"):
+        present = [c for c in bool_cols if c in df.columns]
+        if present:
+            # One 2-D object array for all bool columns, one np.where per mapped value
+            sub = df[present].to_numpy(dtype=object)
+            hits = {text: sub == text for text in _BOOL_MAP}
+            out = sub
+            for text, value in _BOOL_MAP.items():
+                out = np.where(hits[text], value, out)
+            df[present] = out
+            # Columns holding nothing but t/f/blank become nullable booleans
+            # (1 byte plus a mask per cell instead of an 8-byte object ref)
+            pure = np.logical_or.reduce([*hits.values(), pd.isna(sub)]).all(axis=0)
+            bool_only = [c for c, ok in zip(present, pure) if ok]
+            if bool_only:
+                df[bool_only] = df[bool_only].astype("boolean")
+
+        csv_bytes = to_csv_bytes(df)
 
     st.download_button(
         label="Download cleaned CSV",
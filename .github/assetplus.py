@@ -1,5 +1,6 @@
 # app.py
-import io, zipfile
+import io, os, zipfile
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import streamlit as st
 
@@ -24,9 +25,11 @@ def assert_required(df: pd.DataFrame):
         st.stop()
 
 def parse_due_date(series: pd.Series) -> pd.Series:
-    # Month-first first (works for ISO 'YYYY-MM-DD HH:MM:SS'), then fall back to day-first
-    d = pd.to_datetime(series, errors="coerce", dayfirst=False)
-    m = d.isna()
+    # ISO 'YYYY-MM-DD HH:MM:SS' first with an explicit format, then fall back to day-first.
+    # No format guessing from the first value, so the result doesn't depend on which
+    # rows are parsed together
+    d = pd.to_datetime(series, errors="coerce", format="ISO8601")
+    m = d.isna() & series.notna()
     if m.any():
         d2 = pd.to_datetime(series[m], errors="coerce", dayfirst=True)
         d.loc[m] = d2
@@ -35,8 +38,9 @@ def parse_due_date(series: pd.Series) -> pd.Series:
 def add_year_month_cols(df: pd.DataFrame) -> pd.DataFrame:
     out = df.copy()
     out["Due date"] = parse_due_date(out["Due date"])
-    out["Year"] = out["Due date"].dt.year
-    out["MonthNum"] = out["Due date"].dt.month
+    # Nullable ints: one blank Due date must not turn every header into "2024.0 Jan"
+    out["Year"] = out["Due date"].dt.year.astype("Int64")
+    out["MonthNum"] = out["Due date"].dt.month.astype("Int64")
     out["Month"] = out["Due date"].dt.strftime("%b")
     return out
 
@@ -45,14 +49,13 @@ def mask_due(df: pd.DataFrame) -> pd.Series:
 
 def pivot_fallback_table(df: pd.DataFrame) -> pd.DataFrame:
     # Build a pivot-like summary with Status='Due'
-    d = df.loc[mask_due(df)].copy()
-    pvt = pd.pivot_table(
-        d,
-        index=["Advisor name"],
-        columns=["Year", "MonthNum", "Month"],
-        values="Amount due",
-        aggfunc="sum",
-        fill_value=0,
+    d = df.loc[mask_due(df)]
+    # Plain groupby-sum + unstack: the same table as pivot_table, without its generic
+    # aggregation layer
+    pvt = (
+        d.groupby(["Advisor name", "Year", "MonthNum", "Month"], sort=True, observed=True)["Amount due"]
+        .sum()
+        .unstack(["Year", "MonthNum", "Month"], fill_value=0)
     )
     # Sort by Year then MonthNum, then flatten to "YYYY Mon"
     if isinstance(pvt.columns, pd.MultiIndex):
@@ -74,9 +77,9 @@ def add_unique_sheet(wb, writer, base_name: str):
     return ws, name
 
 def write_workbook_for_adviser(df_all_adv_rows: pd.DataFrame, adviser: str) -> bytes:
-    # Keep ALL rows for this adviser in Data
-    df = add_year_month_cols(df_all_adv_rows.copy())
-    df["Amount due"] = pd.to_numeric(df["Amount due"], errors="coerce").fillna(0)
+    # Keep ALL rows for this adviser in Data (dates, Year/MonthNum/Month and numeric
+    # Amount due are prepared once by the caller)
+    df = df_all_adv_rows
 
     import xlsxwriter
     from xlsxwriter.utility import xl_col_to_name
@@ -89,8 +92,7 @@ def write_workbook_for_adviser(df_all_adv_rows: pd.DataFrame, adviser: str) -> b
         wsD = xw.sheets["Data"]
         rows, cols = df.shape
         wsD.autofilter(0, 0, rows, cols - 1)
-        for i in range(cols):
-            wsD.set_column(i, i, 16)
+        wsD.set_column(0, cols - 1, 16)
         # Hide helper cols (Year, MonthNum, Month) if present at end
         if cols >= 3:
             wsD.set_column(cols - 3, cols - 1, None, None, {"hidden": 1})
@@ -130,24 +132,37 @@ def write_workbook_for_adviser(df_all_adv_rows: pd.DataFrame, adviser: str) -> b
     out.seek(0)
     return out.read()
 
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_upload(data: bytes, name: str) -> pd.DataFrame:
+    # Keyed on the upload bytes, so reruns (e.g. each multiselect change) skip the
+    # read and the "Due date"/"Amount due" parsing
+    buf = io.BytesIO(data)
+    df = normalise(pd.read_csv(buf) if name.lower().endswith(".csv") else pd.read_excel(buf))
+    if any(c not in df.columns for c in REQ):
+        return df  # assert_required reports what is missing
+    # Parsed once for the whole upload; each adviser's workbook slices the result
+    df = add_year_month_cols(df)
+    df["Amount due"] = pd.to_numeric(df["Amount due"], errors="coerce").fillna(0)
+    return df
+
 # ---------- UI ----------
 st.title("Adviser Report Builder")
 
 up = st.file_uploader("Upload data (.xlsx or .csv)", type=["xlsx","csv"])
 if up:
-    df = pd.read_csv(up) if up.name.lower().endswith(".csv") else pd.read_excel(up)
-    df = normalise(df)
+    df = load_upload(up.getvalue(), up.name)
     assert_required(df)
 
     advisers = sorted(df["Advisor name"].dropna().astype(str).unique())
     selected = st.multiselect("Select advisers (one workbook per adviser)", advisers)
 
     if st.button("Generate report(s)", type="primary", disabled=(len(selected) == 0)):
+        # Partition rows by adviser once rather than rescanning the frame per adviser
+        groups = dict(tuple(df.groupby(df["Advisor name"].astype(str), sort=False)))
+        no_rows = df.iloc[0:0]
         if len(selected) == 1:
             adv = selected[0]
-            adv_df_all = df[df["Advisor name"].astype(str) == adv]
-            if adv_df_all.empty:
-                adv_df_all = df.iloc[0:0]
+            adv_df_all = groups.get(adv, no_rows)
             xlsx = write_workbook_for_adviser(adv_df_all, adv)
             st.download_button(
                 f"Download {adv}.xlsx",
@@ -156,13 +171,14 @@ if up:
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             )
         else:
+            frames = [groups.get(adv, no_rows) for adv in selected]
             mem = io.BytesIO()
-            with zipfile.ZipFile(mem, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-                for adv in selected:
-                    adv_df_all = df[df["Advisor name"].astype(str) == adv]
-                    if adv_df_all.empty:
-                        adv_df_all = df.iloc[0:0]
-                    xlsx = write_workbook_for_adviser(adv_df_all, adv)
+            # Workbooks are independent: build them on a thread pool (xlsxwriter's
+            # deflate runs in zlib without the GIL) and zip each one as it arrives, in order
+            workers = min(len(selected), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=workers) as ex, \
+                    zipfile.ZipFile(mem, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for adv, xlsx in zip(selected, ex.map(write_workbook_for_adviser, frames, selected)):
                     zf.writestr(f"{adv}.xlsx", xlsx)
             mem.seek(0)
             st.download_button(
@@ -1,21 +1,23 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
-from sklearn.metrics import r2_score, classification_report
-from fpdf import FPDF
-import matplotlib.pyplot as plt
 import tempfile
+import io
 
 st.title("Adviser Income Forecast & Performance Flagging (Clean Predictors)")
 
-uploaded_file = st.file_uploader("Upload adviser dataset (CSV)", type="csv")
-if uploaded_file:
-    # Load data
-    df = pd.read_csv(uploaded_file)
-    st.subheader("Data Preview")
-    st.dataframe(df.head())
+@st.cache_data(show_spinner="Training models…")
+def train_models(csv_bytes: bytes):
+    # Keyed on the raw upload bytes, so reruns with the same CSV skip cleaning and training
+
+    # sklearn is imported on first use so the upload page paints without it
+    from sklearn.model_selection import train_test_split
+    from sklearn.ensemble import HistGradientBoostingRegressor, HistGradientBoostingClassifier
+    from sklearn.inspection import permutation_importance
+    from sklearn.metrics import r2_score, classification_report
+
+    df = pd.read_csv(io.BytesIO(csv_bytes))
+    preview = df.head()
 
     # ---- Zero-fill commission columns for classification ----
     for col in ["Total Commission Earned Year To Date", "Total Commission Earned Last Year"]:
@@ -40,60 +42,136 @@ if uploaded_file:
     df['File Review Pass %'] = pd.to_numeric(df['File Review Pass %'], errors='coerce').fillna(0)
     df['Forecasted Revenue'] = pd.to_numeric(df['Forecasted Revenue'], errors='coerce').fillna(0)
 
-    # ---- Prepare data for regression ----
-    # Use entire df since all predictors and target zero-filled
-    reg_df = df.copy()
-    n_reg = len(reg_df)
-    st.write(f"Records for regression: {n_reg}")
-
-    # ---- Regression Model ----
-    if n_reg >= 2:
-        X = reg_df[feature_cols]
-        y_reg = reg_df[target_col]
-        test_size = 0.2 if n_reg * 0.2 >= 1 else 1 / n_reg
-
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y_reg, test_size=test_size, random_state=42
+    # ---- Shared train/test split ----
+    # Use entire df since all predictors and targets are zero-filled; both models see
+    # the same rows, so one split of the row positions serves both
+    n_rows = len(df)
+    reg_result = None
+    clf_result = None
+    if n_rows >= 2:
+        test_size = 0.2 if n_rows * 0.2 >= 1 else 1 / n_rows
+        idx_train, idx_test = train_test_split(
+            np.arange(n_rows), test_size=test_size, random_state=42
         )
-        reg = RandomForestRegressor(n_estimators=100, random_state=42)
+        X = df[feature_cols].to_numpy()
+        X_train, X_test = X[idx_train], X[idx_test]
+        # The default leaf size of 20 leaves small uploads with no splits at all
+        min_leaf = max(1, min(20, len(idx_train) // 10))
+
+        # ---- Regression Model ----
+        y_reg = df[target_col].to_numpy()
+        y_train, y_test = y_reg[idx_train], y_reg[idx_test]
+        reg = HistGradientBoostingRegressor(max_iter=100, min_samples_leaf=min_leaf, random_state=42)
         reg.fit(X_train, y_train)
         y_pred_reg = reg.predict(X_test)
         r2 = r2_score(y_test, y_pred_reg)
-        importances_reg = pd.Series(reg.feature_importances_, index=feature_cols).sort_values(ascending=False)
+        # Boosted trees expose no feature_importances_; measure on the held-out split instead
+        perm_reg = permutation_importance(reg, X_test, y_test, n_repeats=5, random_state=42)
+        importances_reg = pd.Series(perm_reg.importances_mean, index=feature_cols).sort_values(ascending=False)
+        reg_result = (r2, importances_reg)
+
+        # ---- Classification Model ----
+        # Underperformer flag: compare the raw arrays, no aligned Series or int64 cast
+        y_clf = np.less_equal(
+            df['Total Commission Earned Year To Date'].to_numpy(),
+            df['Total Commission Earned Last Year'].to_numpy()
+        ).astype(np.uint8)
+        y2_train, y2_test = y_clf[idx_train], y_clf[idx_test]
+        clf = HistGradientBoostingClassifier(max_iter=100, min_samples_leaf=min_leaf, random_state=42)
+        clf.fit(X_train, y2_train)
+        y2_pred = clf.predict(X_test)
+
+        report = classification_report(y2_test, y2_pred, output_dict=True)
+        report_df = pd.DataFrame(report).transpose()
+        perm_clf = permutation_importance(clf, X_test, y2_test, n_repeats=5, random_state=42)
+        importances_clf = pd.Series(perm_clf.importances_mean, index=feature_cols).sort_values(ascending=False)
+        clf_result = (report_df, importances_clf)
+
+    return preview, n_rows, reg_result, clf_result
+
+@st.cache_data(show_spinner=False)
+def build_report_pdf(r2, importances_reg, report_df, importances_clf):
+    # Keyed on the cached model results, so reruns reuse the rendered charts and PDF
+    import matplotlib
+    matplotlib.use("Agg")  # headless server; skip GUI backend probing
+    import matplotlib.pyplot as plt
+    from fpdf import FPDF
+
+    # One figure redrawn for both charts; ~100 dpi is all a 190 mm wide PDF image shows
+    fig, ax = plt.subplots(figsize=(8,4))
+
+    # Regression chart
+    importances_reg.plot.bar(ax=ax)
+    ax.set_title("Feature Importance for Income Forecast")
+    ax.set_ylabel("Importance")
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    fig.tight_layout()
+    reg_chart = tempfile.NamedTemporaryFile(suffix=".png", delete=False).name
+    fig.savefig(reg_chart, dpi=100)
+
+    # Classification chart
+    ax.clear()
+    importances_clf.plot.bar(ax=ax, color='orange')
+    ax.set_title("Feature Importance for Underperformance Flag")
+    ax.set_ylabel("Importance")
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    fig.tight_layout()
+    clf_chart = tempfile.NamedTemporaryFile(suffix=".png", delete=False).name
+    fig.savefig(clf_chart, dpi=100)
+    plt.close(fig)
+
+    # Build PDF
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(0, 10, "Adviser Performance Insights", ln=True, align='C')
+
+    pdf.set_font("Arial", '', 12)
+    pdf.ln(5)
+    pdf.cell(0, 8, f"Income Forecast R²: {r2:.2f}", ln=True)
+    pdf.image(reg_chart, x=10, w=190)
+
+    pdf.ln(5)
+    pdf.cell(0, 8, "Underperformer Classification Report:", ln=True)
+    # One multi_cell per block instead of a cell per line
+    # First three report rows, read straight off the columns rather than boxing rows with iterrows
+    report_lines = [
+        f" {label}: precision {precision:.2f}, recall {recall:.2f}"
+        for label, precision, recall in zip(report_df.index[:3], report_df['precision'], report_df['recall'])
+    ]
+    pdf.multi_cell(0, 6, "\n".join(report_lines), align='L')
+
+    pdf.ln(5)
+    pdf.image(clf_chart, x=10, w=190)
 
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(0, 8, "Full Feature Importance (Regression)", ln=True)
+    pdf.set_font("Arial", '', 10)
+    importance_lines = [f"{feature:<40} {coef:.4f}" for feature, coef in importances_reg.items()]
+    pdf.multi_cell(0, 6, "\n".join(importance_lines), align='L')
+
+    return pdf.output(dest='S').encode('latin-1')
+
+uploaded_file = st.file_uploader("Upload adviser dataset (CSV)", type="csv")
+if uploaded_file:
+    # Load data, clean and train (cached on the upload's bytes)
+    preview, n_rows, reg_result, clf_result = train_models(uploaded_file.getvalue())
+    st.subheader("Data Preview")
+    st.dataframe(preview)
+
+    st.write(f"Records for regression: {n_rows}")
+    if reg_result is not None:
+        r2, importances_reg = reg_result
         st.subheader("Clean Regression Results")
         st.write(f"R² with clean predictors: **{r2:.2f}**")
         st.bar_chart(importances_reg)
     else:
         st.error("Not enough data for regression.")
 
-    # ---- Prepare data for classification ----
-    clf_df = df.copy()
-    n_clf = len(clf_df)
-    st.write(f"Records for classification: {n_clf}")
-
-    # ---- Classification Model ----
-    if n_clf >= 2:
-        df_clf = clf_df.copy()
-        df_clf['Underperformer'] = (
-            df_clf['Total Commission Earned Year To Date'] <= 
-            df_clf['Total Commission Earned Last Year']
-        ).astype(int)
-        X2 = df_clf[feature_cols]
-        y_clf = df_clf['Underperformer']
-        test_size_clf = 0.2 if n_clf * 0.2 >= 1 else 1 / n_clf
-
-        X2_train, X2_test, y2_train, y2_test = train_test_split(
-            X2, y_clf, test_size=test_size_clf, random_state=42
-        )
-        clf = RandomForestClassifier(n_estimators=100, random_state=42)
-        clf.fit(X2_train, y2_train)
-        y2_pred = clf.predict(X2_test)
-
-        report = classification_report(y2_test, y2_pred, output_dict=True)
-        report_df = pd.DataFrame(report).transpose()
-        importances_clf = pd.Series(clf.feature_importances_, index=feature_cols).sort_values(ascending=False)
-
+    st.write(f"Records for classification: {n_rows}")
+    if clf_result is not None:
+        report_df, importances_clf = clf_result
         st.subheader("Clean Classification Results")
         st.dataframe(report_df)
         st.bar_chart(importances_clf)
@@ -101,56 +179,8 @@ if uploaded_file:
         st.error("Not enough data for classification.")
 
     # ---- Generate charts & PDF ----
-    if 'importances_reg' in locals() and 'importances_clf' in locals():
-        # Regression chart
-        plt.figure(figsize=(8,4))
-        importances_reg.plot.bar()
-        plt.title("Feature Importance for Income Forecast")
-        plt.ylabel("Importance")
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        reg_chart = tempfile.NamedTemporaryFile(suffix=".png", delete=False).name
-        plt.savefig(reg_chart, dpi=150)
-        plt.close()
-
-        # Classification chart
-        plt.figure(figsize=(8,4))
-        importances_clf.plot.bar(color='orange')
-        plt.title("Feature Importance for Underperformance Flag")
-        plt.ylabel("Importance")
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        clf_chart = tempfile.NamedTemporaryFile(suffix=".png", delete=False).name
-        plt.savefig(clf_chart, dpi=150)
-        plt.close()
-
-        # Build PDF
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", 'B', 16)
-        pdf.cell(0, 10, "Adviser Performance Insights", ln=True, align='C')
-
-        pdf.set_font("Arial", '', 12)
-        pdf.ln(5)
-        pdf.cell(0, 8, f"Income Forecast R²: {r2:.2f}", ln=True)
-        pdf.image(reg_chart, x=10, w=190)
-
-        pdf.ln(5)
-        pdf.cell(0, 8, "Underperformer Classification Report:", ln=True)
-        for idx, row in report_df.head(3).iterrows():
-            pdf.cell(0, 6, f" {idx}: precision {row['precision']:.2f}, recall {row['recall']:.2f}", ln=True)
-
-        pdf.ln(5)
-        pdf.image(clf_chart, x=10, w=190)
-
-        pdf.add_page()
-        pdf.set_font("Arial", 'B', 14)
-        pdf.cell(0, 8, "Full Feature Importance (Regression)", ln=True)
-        pdf.set_font("Arial", '', 10)
-        for feature, coef in importances_reg.items():
-            pdf.cell(0, 6, f"{feature:<40} {coef:.4f}", ln=True)
-
-        pdf_bytes = pdf.output(dest='S').encode('latin-1')
+    if reg_result is not None and clf_result is not None:
+        pdf_bytes = build_report_pdf(r2, importances_reg, report_df, importances_clf)
         st.download_button(
             label="Download Insight Report (PDF)",
             data=pdf_bytes,
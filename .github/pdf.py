@@ -1,12 +1,15 @@
 import streamlit as st
 import os
 import tempfile
-import extract_msg
+import io
 from fpdf import FPDF
-from pathlib import Path
 import zipfile
+import shutil
 import re
 
+# Anything outside this set becomes "_" in output filenames
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^A-Za-z0-9_-]')
+
 # Helper: Create PDF from .msg email (no attachments)
 class EmailPDF(FPDF):
     def header(self):
@@ -20,11 +23,14 @@ class EmailPDF(FPDF):
         self.add_page()
         self.set_font("Arial", size=12)
 
-        # Headers
-        self.multi_cell(0, 10, f"From: {getattr(msg, 'sender', '') or '(no sender)'}")
-        self.multi_cell(0, 10, f"To: {getattr(msg, 'to', '') or '(no recipient)'}")
-        self.multi_cell(0, 10, f"Subject: {getattr(msg, 'subject', '') or '(no subject)'}")
-        self.multi_cell(0, 10, f"Date: {getattr(msg, 'date', '') or '(no date)'}")
+        # Headers, laid out as one multi_cell block
+        headers = [
+            f"From: {getattr(msg, 'sender', '') or '(no sender)'}",
+            f"To: {getattr(msg, 'to', '') or '(no recipient)'}",
+            f"Subject: {getattr(msg, 'subject', '') or '(no subject)'}",
+            f"Date: {getattr(msg, 'date', '') or '(no date)'}",
+        ]
+        self.multi_cell(0, 10, "\n".join(headers))
         self.ln(10)
 
         # Body
@@ -36,55 +42,60 @@ class EmailPDF(FPDF):
             self.multi_cell(0, 10, f"[Error rendering body: {e}]")
 
 # Convert .msg files in a zip to PDFs (including subfolders)
-def convert_zipped_msg_files(zip_file, output_dir, progress_callback):
-    # Unzip incoming buffer
-    work = tempfile.mkdtemp()
-    zip_in = os.path.join(work, "in.zip")
-    with open(zip_in, "wb") as f:
-        f.write(zip_file.read())
-    with zipfile.ZipFile(zip_in, 'r') as zp:
-        zp.extractall(work)
-
-    # Gather all .msg paths
-    msg_paths = list(Path(work).rglob("*.msg"))
-    total = len(msg_paths)
-    if total == 0:
-        return False
-
-    for idx, path in enumerate(msg_paths, start=1):
-        # Attempt to parse message
-        try:
-            msg = extract_msg.Message(str(path))
-        except Exception:
-            # Create a stub message if parsing fails
-            class Stub: pass
-            msg = Stub()
-            msg.sender = msg.to = msg.subject = msg.date = msg.body = ""
-
-        # Build PDF
-        pdf = EmailPDF()
-        pdf.msg_to_pdf(msg)
-
-        # Sanitize subject for filename
-        raw_subj = getattr(msg, 'subject', '') or f"email_{idx}"
-        # Replace non-alphanumeric chars with underscore
-        safe_subj = re.sub(r'[^A-Za-z0-9_-]', '_', raw_subj)[:100]
-        filename = f"{idx:04d}_{safe_subj}.pdf"
-        out_path = os.path.join(output_dir, filename)
-
-        # Write PDF, fallback to stub if write fails
-        try:
-            pdf.output(out_path)
-        except Exception:
-            # Generate minimal stub PDF
-            stub = FPDF()
-            stub.add_page()
-            stub.set_font("Arial", size=12)
-            stub.multi_cell(0, 10, "[Unable to generate this email PDF]")
-            stub.output(out_path)
-
-        # Update progress bar
-        progress_callback(idx / total)
+def convert_zipped_msg_files(zip_file, zip_out, progress_callback):
+    import extract_msg  # only needed once a conversion actually runs
+
+    # Read entries straight from the uploaded buffer; no copy of the zip or bulk extractall
+    scratch = os.path.join(tempfile.mkdtemp(), "current.msg")
+    with zipfile.ZipFile(zip_file, 'r') as zp:
+        # Gather all .msg entries (including subfolders), skipping macOS resource-fork copies
+        msg_infos = [info for info in zp.infolist()
+                     if not info.is_dir()
+                     and info.filename.lower().endswith(".msg")
+                     and not info.filename.startswith("__MACOSX/")]
+        total = len(msg_infos)
+        if total == 0:
+            return False
+
+        for idx, info in enumerate(msg_infos, start=1):
+            # Only the message being converted is on disk at a time
+            with zp.open(info) as src, open(scratch, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+
+            # Attempt to parse message; attachments aren't exported, so don't load them
+            try:
+                msg = extract_msg.Message(scratch, delayAttachments=True)
+            except Exception:
+                # Create a stub message if parsing fails
+                class Stub: pass
+                msg = Stub()
+                msg.sender = msg.to = msg.subject = msg.date = msg.body = ""
+
+            # Build PDF
+            pdf = EmailPDF()
+            pdf.msg_to_pdf(msg)
+
+            # Sanitize subject for filename
+            raw_subj = getattr(msg, 'subject', '') or f"email_{idx}"
+            # Replace non-alphanumeric chars with underscore
+            safe_subj = _UNSAFE_FILENAME_CHARS.sub('_', raw_subj)[:100]
+            filename = f"{idx:04d}_{safe_subj}.pdf"
+
+            # Render PDF, fallback to stub if rendering fails
+            try:
+                pdf_bytes = pdf.output(dest='S').encode('latin-1')
+            except Exception:
+                # Generate minimal stub PDF
+                stub = FPDF()
+                stub.add_page()
+                stub.set_font("Arial", size=12)
+                stub.multi_cell(0, 10, "[Unable to generate this email PDF]")
+                pdf_bytes = stub.output(dest='S').encode('latin-1')
+            # Straight into the output zip; no per-message file on disk
+            zip_out.writestr(filename, pdf_bytes)
+
+            # Update progress bar
+            progress_callback(idx / total)
 
     st.info(f"✅ {total}/{total} emails converted to PDF.")
     return True
@@ -96,26 +107,18 @@ st.markdown("Upload a `.zip` of `.msg` files; each one becomes a uniquely named
 uploaded = st.file_uploader("ZIP with .msg emails", type="zip")
 if uploaded and st.button("Convert Emails to PDFs"):
     with st.spinner("Processing emails…"):
-        temp_dir = tempfile.mkdtemp()
-        output_dir = os.path.join(temp_dir, "pdf_output")
-        os.makedirs(output_dir, exist_ok=True)
         progress_bar = st.progress(0.0)
-        success = convert_zipped_msg_files(uploaded, output_dir, lambda p: progress_bar.progress(p))
+        zip_buffer = io.BytesIO()
+        # PDFs barely deflate, so store them
+        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_STORED) as zf:
+            success = convert_zipped_msg_files(uploaded, zf, lambda p: progress_bar.progress(p))
         if not success:
             st.error("No .msg files found or conversion failed.")
         else:
-            # Zip up PDFs
-            zip_out = os.path.join(temp_dir, "converted_pdfs.zip")
-            with zipfile.ZipFile(zip_out, 'w') as zf:
-                for root, _, files in os.walk(output_dir):
-                    for f in files:
-                        full = os.path.join(root, f)
-                        zf.write(full, os.path.relpath(full, output_dir))
-            with open(zip_out, "rb") as f:
-                st.download_button(
-                    label="📥 Download Converted PDFs",
-                    data=f,
-                    file_name="converted_pdfs.zip",
-                    mime="application/zip"
-                )
+            st.download_button(
+                label="📥 Download Converted PDFs",
+                data=zip_buffer.getvalue(),
+                file_name="converted_pdfs.zip",
+                mime="application/zip"
+            )
             st.success("Conversion complete—one valid PDF per message!")
@@ -11,7 +11,6 @@ import tempfile
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email.mime.text import MIMEText
-from email import encoders
 
 st.title("Commission Statement Generator")
 
@@ -50,13 +49,16 @@ if raw_data_file and template_file:
                 if not all(col in raw_df.columns for col in expected_columns):
                     st.error("The raw data is missing one or more required columns.")
                 else:
-                    unique_firms = raw_df["AR Firm Name"].dropna().unique()
-                    total_firms = len(unique_firms)
+                    # One hash-partition pass instead of a full-column compare per firm; first-seen order
+                    firm_groups = raw_df.groupby("AR Firm Name", sort=False)
+                    total_firms = firm_groups.ngroups
                     progress_bar = st.progress(0)
                     status_text = st.empty()
+                    # Styles are immutable, so one instance serves every cell
+                    data_font = Font(name="Calibri", size=9, bold=False)
 
-                    for i, firm in enumerate(unique_firms):
-                        firm_data = raw_df[raw_df["AR Firm Name"] == firm].sort_values(by= "Commission Payable", ascending= False)
+                    for i, (firm, firm_data) in enumerate(firm_groups):
+                        firm_data = firm_data.sort_values(by= "Commission Payable", ascending= False)
                         template_file.seek(0)
                         wb = load_workbook(template_file)
                         ws = wb.active
@@ -64,27 +66,31 @@ if raw_data_file and template_file:
                         paid_date = firm_data["Date Paid to AR"].iloc[0] if pd.notnull(firm_data["Date Paid to AR"].iloc[0]) else None
                         ws["H5"] = firm_data["Date Paid to AR"].iloc[0].date() if pd.notnull(firm_data["Date Paid to AR"].iloc[0]) else ""
                         start_row = 7
-                        for idx, row in firm_data.iterrows():
-                            data_font = Font(name="Calibri", size=9, bold=False)
-                            ws.cell(row=start_row, column=1, value=row["Adviser Name"]).font = data_font
-                            ws.cell(row=start_row, column=2, value=row["Date of Statement"].date() if pd.notnull(row["Date of Statement"]) else "").font = data_font
-                            ws.cell(row=start_row, column=3, value=row["Lender"]).font = data_font
-                            ws.cell(row=start_row, column=4, value=row["Policy Reference"]).font = data_font
-                            ws.cell(row=start_row, column=5, value=row["Product Type"]).font = data_font
-                            ws.cell(row=start_row, column=6, value=row["Client First Name"]).font = data_font
-                            ws.cell(row=start_row, column=7, value=row["Client Surname"]).font = data_font
-                            ws.cell(row=start_row, column=8, value=row["Class"]).font = data_font
-                            commission_cell = ws.cell(row=start_row, column=9, value=row["Commission Payable"])
+                        # Plain tuples rather than a Series per row
+                        statement_rows = firm_data[[
+                            "Adviser Name", "Date of Statement", "Lender", "Policy Reference", "Product Type",
+                            "Client First Name", "Client Surname", "Class", "Commission Payable"
+                        ]].itertuples(index=False, name=None)
+                        for adviser, statement_date, lender, policy_ref, product_type, first_name, surname, case_class, commission in statement_rows:
+                            ws.cell(row=start_row, column=1, value=adviser).font = data_font
+                            ws.cell(row=start_row, column=2, value=statement_date.date() if pd.notnull(statement_date) else "").font = data_font
+                            ws.cell(row=start_row, column=3, value=lender).font = data_font
+                            ws.cell(row=start_row, column=4, value=policy_ref).font = data_font
+                            ws.cell(row=start_row, column=5, value=product_type).font = data_font
+                            ws.cell(row=start_row, column=6, value=first_name).font = data_font
+                            ws.cell(row=start_row, column=7, value=surname).font = data_font
+                            ws.cell(row=start_row, column=8, value=case_class).font = data_font
+                            commission_cell = ws.cell(row=start_row, column=9, value=commission)
                             commission_cell.number_format = u"\u00a3#,##0.00"
                             commission_cell.font = data_font
                             start_row += 1
 
                         output_buffer = io.BytesIO()
                         wb.save(output_buffer)
-                        output_buffer.seek(0)
+                        xlsx_bytes = output_buffer.getvalue()  # one copy, shared by the zip and the EML
                         formatted_date = paid_date.strftime("%d-%m-%Y") if paid_date else datetime.now().strftime("%d-%m-%Y")
                         filename = f"{firm} {formatted_date}.xlsx"
-                        zipf.writestr(filename, output_buffer.getvalue())
+                        zipf.writestr(filename, xlsx_bytes)
                         recipient = firm_data["Principal/Adviser Email Address"].iloc[0]
                         recipient = recipient if pd.notnull(recipient) else ""
                         subject = f"Commission Statement - {firm}"
@@ -146,8 +152,7 @@ if raw_data_file and template_file:
                         alt_part.attach(MIMEText(html_body, "html"))
                         msg.attach(alt_part)
                         from email.mime.application import MIMEApplication
-                        part = MIMEApplication(output_buffer.getvalue(), _subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet", Name=filename)
-                        encoders.encode_base64(part)
+                        part = MIMEApplication(xlsx_bytes, _subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet", Name=filename)
                         part.add_header("Content-Disposition", f"attachment; filename=\"{filename}\"")
                         msg.attach(part)
                         eml_filename = f"Email_{firm.replace(' ', '_')}.eml"
@@ -155,8 +160,7 @@ if raw_data_file and template_file:
                         from email.generator import BytesGenerator
                         gen = BytesGenerator(eml_io)
                         gen.flatten(msg)
-                        eml_io.seek(0)
-                        eml_zip.writestr(eml_filename, eml_io.read())
+                        eml_zip.writestr(eml_filename, eml_io.getvalue())
                         elapsed = time.time() - start_time
                         progress_bar.progress((i + 1) / total_firms)
                         status_text.text(f"Processed {i + 1} of {total_firms} firms in {elapsed:.2f} seconds")
@@ -176,12 +180,13 @@ if raw_data_file and template_file:
                 if not all(col in raw_df.columns for col in column_mapping.keys()):
                     st.error("The raw TRB data is missing one or more required columns.")
                 else:
-                    advisers = raw_df["Adviser"].dropna().unique()
-                    total_firms = len(advisers)
+                    adviser_groups = raw_df.groupby("Adviser", sort=False)
+                    total_firms = adviser_groups.ngroups
                     progress_bar = st.progress(0)
                     status_text = st.empty()
-                    for i, adviser in enumerate(advisers):
-                        adviser_data = raw_df[raw_df["Adviser"] == adviser].copy()
+                    data_font = Font(name="Calibri", size=8, bold=False)
+                    left_align = Alignment(horizontal="left")
+                    for i, (adviser, adviser_data) in enumerate(adviser_groups):
                         adviser_data = adviser_data.sort_values(by="Adviser Commission",ascending = False)
                         template_file.seek(0)
                         wb = load_workbook(template_file)
@@ -190,26 +195,23 @@ if raw_data_file and template_file:
                         paid_date = adviser_data.iloc[0]["Date Paid to Adviser"] if "Date Paid to Adviser" in adviser_data.columns and pd.notnull(adviser_data.iloc[0]["Date Paid to Adviser"]) else None
                         ws["H5"] = adviser_data.iloc[0]["Date Paid to Adviser"].strftime("%d/%m/%Y") if "Date Paid to Adviser" in adviser_data.columns and pd.notnull(adviser_data.iloc[0]["Date Paid to Adviser"]) else ""
                         start_row = 7
-                        for idx, row in adviser_data.iterrows():
-                            data_font = Font(name="Calibri", size=8, bold=False)
-                            for col_index, (src_col, dst_col) in enumerate(column_mapping.items(), start=1):
-                                if "Date" in src_col and pd.notnull(row[src_col]):
-                                    value = row[src_col].strftime("%d/%m/%Y")
-                                else:
-                                    value = row[src_col]
+                        for row in adviser_data[list(column_mapping)].itertuples(index=False, name=None):
+                            for col_index, ((src_col, dst_col), value) in enumerate(zip(column_mapping.items(), row), start=1):
+                                if "Date" in src_col and pd.notnull(value):
+                                    value = value.strftime("%d/%m/%Y")
                                 cell = ws.cell(row=start_row, column=col_index, value=value)
                                 cell.font = data_font
                                 if dst_col.lower() == "policy reference":
-                                    cell.alignment = Alignment(horizontal="left")
+                                    cell.alignment = left_align
                             start_row += 1
                         output_buffer = io.BytesIO()
                         wb.save(output_buffer)
-                        output_buffer.seek(0)
+                        xlsx_bytes = output_buffer.getvalue()
                         total_commission = adviser_data['Adviser Commission'].sum()
                         total_str = f"£{total_commission:,.2f}"
                         formatted_date = paid_date.strftime("%d-%m-%Y") if paid_date else datetime.now().strftime("%d-%m-%Y")
                         filename = f"{adviser} {formatted_date} - {total_str}.xlsx"
-                        zipf.writestr(filename, output_buffer.getvalue())
+                        zipf.writestr(filename, xlsx_bytes)
                         msg = MIMEMultipart("mixed")
                         recipient = adviser_data["Email"].iloc[0] if "Email" in adviser_data.columns and pd.notnull(adviser_data["Email"].iloc[0]) else ""
                         msg["To"] = recipient
@@ -233,8 +235,7 @@ if raw_data_file and template_file:
                         alt_part.attach(MIMEText(html_body, "html"))
                         msg.attach(alt_part)
                         from email.mime.application import MIMEApplication
-                        part = MIMEApplication(output_buffer.getvalue(), _subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet", Name=filename)
-                        encoders.encode_base64(part)
+                        part = MIMEApplication(xlsx_bytes, _subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet", Name=filename)
                         part.add_header("Content-Disposition", f"attachment; filename=\"{filename}\"")
                         msg.attach(part)
                         eml_filename = f"Email_TRB_{adviser.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}_{total_str}.eml"
@@ -242,8 +243,7 @@ if raw_data_file and template_file:
                         from email.generator import BytesGenerator
                         gen = BytesGenerator(eml_io)
                         gen.flatten(msg)
-                        eml_io.seek(0)
-                        eml_zip.writestr(eml_filename, eml_io.read())
+                        eml_zip.writestr(eml_filename, eml_io.getvalue())
                         elapsed = time.time() - start_time
                         progress_bar.progress((i + 1) / total_firms)
                         status_text.text(f"Processed {i + 1} of {total_firms} advisers in {elapsed:.2f} seconds")
@@ -262,12 +262,13 @@ if raw_data_file and template_file:
                             if not all(col in raw_df.columns for col in column_mapping.keys()):
                                 st.error("The raw TRB Introducers data is missing one or more required columns.")
                             else:
-                                introducers = raw_df["Introducer"].dropna().unique()
-                                total_firms = len(introducers)
+                                introducer_groups = raw_df.groupby("Introducer", sort=False)
+                                total_firms = introducer_groups.ngroups
                                 progress_bar = st.progress(0)
                                 status_text = st.empty()
-                                for i, introducer in enumerate(introducers):
-                                    introducer_data = raw_df[raw_df["Introducer"] == introducer].copy()
+                                data_font = Font(name="Calibri", size=8, bold=False)
+                                left_align = Alignment(horizontal="left")
+                                for i, (introducer, introducer_data) in enumerate(introducer_groups):
                                     introducer_data = introducer_data.sort_values(by="Introducer Commission",ascending = False)
                                     template_file.seek(0)
                                     wb = load_workbook(template_file)
@@ -276,26 +277,23 @@ if raw_data_file and template_file:
                                     paid_date = introducer_data.iloc[0]["Date Paid to Introducer"] if "Date Paid to Introducer" in introducer_data.columns and pd.notnull(introducer_data.iloc[0]["Date Paid to Introducer"]) else None
                                     ws["H5"] = introducer_data.iloc[0]["Date Paid to Introducer"].strftime("%d/%m/%Y") if "Date Paid to Introducer" in introducer_data.columns and pd.notnull(introducer_data.iloc[0]["Date Paid to Introducer"]) else ""
                                     start_row = 7
-                                    for idx, row in introducer_data.iterrows():
-                                        data_font = Font(name="Calibri", size=8, bold=False)
-                                        for col_index, (src_col, dst_col) in enumerate(column_mapping.items(), start=1):
-                                            if "Date" in src_col and pd.notnull(row[src_col]):
-                                                value = row[src_col].strftime("%d/%m/%Y")
-                                            else:
-                                                value = row[src_col]
+                                    for row in introducer_data[list(column_mapping)].itertuples(index=False, name=None):
+                                        for col_index, ((src_col, dst_col), value) in enumerate(zip(column_mapping.items(), row), start=1):
+                                            if "Date" in src_col and pd.notnull(value):
+                                                value = value.strftime("%d/%m/%Y")
                                             cell = ws.cell(row=start_row, column=col_index, value=value)
                                             cell.font = data_font
                                             if dst_col.lower() == "policy reference":
-                                                cell.alignment = Alignment(horizontal="left")
+                                                cell.alignment = left_align
                                         start_row += 1
                                     output_buffer = io.BytesIO()
                                     wb.save(output_buffer)
-                                    output_buffer.seek(0)
+                                    xlsx_bytes = output_buffer.getvalue()
                                     total_commission = introducer_data['Introducer Commission'].sum()
                                     total_str = f"£{total_commission:,.2f}"
                                     formatted_date = paid_date.strftime("%d-%m-%Y") if paid_date else datetime.now().strftime("%d-%m-%Y")
                                     filename = f"{introducer} {formatted_date} - {total_str}.xlsx"
-                                    zipf.writestr(filename, output_buffer.getvalue())
+                                    zipf.writestr(filename, xlsx_bytes)
                                     msg = MIMEMultipart("mixed")
                                     recipient = introducer_data["Introducer Email"].iloc[0] if "Introducer Email" in introducer_data.columns and pd.notnull(introducer_data["Introducer Email"].iloc[0]) else ""
                                     msg["To"] = recipient
@@ -318,8 +316,7 @@ if raw_data_file and template_file:
                                     alt_part.attach(MIMEText(html_body, "html"))
                                     msg.attach(alt_part)
                                     from email.mime.application import MIMEApplication
-                                    part = MIMEApplication(output_buffer.getvalue(), _subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet", Name=filename)
-                                    encoders.encode_base64(part)
+                                    part = MIMEApplication(xlsx_bytes, _subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet", Name=filename)
                                     part.add_header("Content-Disposition", f"attachment; filename=\"{filename}\"")
                                     msg.attach(part)
                                     eml_filename = f"Email_TRB_Introducer_{introducer.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}_{total_str}.eml"
@@ -327,8 +324,7 @@ if raw_data_file and template_file:
                                     from email.generator import BytesGenerator
                                     gen = BytesGenerator(eml_io)
                                     gen.flatten(msg)
-                                    eml_io.seek(0)
-                                    eml_zip.writestr(eml_filename, eml_io.read())
+                                    eml_zip.writestr(eml_filename, eml_io.getvalue())
                                     elapsed = time.time() - start_time
                                     progress_bar.progress((i + 1) / total_firms)
                                     status_text.text(f"Processed {i + 1} of {total_firms} introducers in {elapsed:.2f} seconds")
@@ -341,13 +337,13 @@ if raw_data_file and template_file:
                 if not all(col in raw_df.columns for col in expected_columns):
                     st.error("The raw Unallocated data is missing one or more required columns.")
                 else:
-                    firms = raw_df["AR Firm Name"].dropna().unique()
-                    total_firms = len(firms)
+                    firm_groups = raw_df.groupby("AR Firm Name", sort=False)
+                    total_firms = firm_groups.ngroups
                     progress_bar = st.progress(0)
                     status_text = st.empty()
+                    data_font = Font(name="Calibri", size=9, bold=False)
 
-                    for i, firm in enumerate(firms):
-                        firm_data = raw_df[raw_df["AR Firm Name"] == firm].copy()
+                    for i, (firm, firm_data) in enumerate(firm_groups):
                         firm_data = firm_data.sort_values(by="Adviser Name")
 
                         template_file.seek(0)
@@ -358,26 +354,24 @@ if raw_data_file and template_file:
                         ws["F4"] = datetime.now().strftime("%d/%m/%Y")
 
                         start_row = 7
-                        for idx, row in firm_data.iterrows():
-                            data_font = Font(name="Calibri", size=9, bold=False)
-                            ws.cell(row=start_row, column=1, value=row["Adviser Name"]).font = data_font
-                            ws.cell(row=start_row, column=2, value=row["Lenders"]).font = data_font
-                            ws.cell(row=start_row, column=3, value=row["Policy Reference"]).font = data_font
-                            ws.cell(row=start_row, column=4, value=row["Product Type"]).font = data_font
-                            ws.cell(row=start_row, column=5, value=row["Client First Name"]).font = data_font
-                            ws.cell(row=start_row, column=6, value=row["Client Surname"]).font = data_font
-                            ws.cell(row=start_row, column=7, value=row["Class"]).font = data_font
+                        case_rows = firm_data[[
+                            "Adviser Name", "Lenders", "Policy Reference", "Product Type",
+                            "Client First Name", "Client Surname", "Class"
+                        ]].itertuples(index=False, name=None)
+                        for col_values in case_rows:
+                            for col_index, value in enumerate(col_values, start=1):
+                                ws.cell(row=start_row, column=col_index, value=value).font = data_font
                             start_row += 1
 
                         output_buffer = io.BytesIO()
                         wb.save(output_buffer)
-                        output_buffer.seek(0)
+                        xlsx_bytes = output_buffer.getvalue()
 
                         formatted_date = datetime.now().strftime("%d-%m-%Y")
                         filename = f"Unallocated - {firm} - {formatted_date}.xlsx"
 
                         # Write Excel to ZIP archive directly (flat)
-                        zipf.writestr(filename, output_buffer.getvalue())
+                        zipf.writestr(filename, xlsx_bytes)
 
                         recipient = firm_data["Email"].iloc[0] if pd.notnull(firm_data["Email"].iloc[0]) else ""
                         subject = f"Unallocated Report - {firm}"
@@ -422,8 +416,7 @@ if raw_data_file and template_file:
                         msg.attach(alt_part)
 
                         from email.mime.application import MIMEApplication
-                        part = MIMEApplication(output_buffer.getvalue(), _subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet", Name=filename)
-                        encoders.encode_base64(part)
+                        part = MIMEApplication(xlsx_bytes, _subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet", Name=filename)
                         part.add_header("Content-Disposition", f"attachment; filename=\"{filename}\"")
                         msg.attach(part)
 
@@ -432,8 +425,7 @@ if raw_data_file and template_file:
                         from email.generator import BytesGenerator
                         gen = BytesGenerator(eml_io)
                         gen.flatten(msg)
-                        eml_io.seek(0)
-                        eml_zip.writestr(eml_filename, eml_io.read())
+                        eml_zip.writestr(eml_filename, eml_io.getvalue())
 
                         elapsed = time.time() - start_time
                         progress_bar.progress((i + 1) / total_firms)